@@ -0,0 +1,166 @@
+"""
+Hot/cold archiving of old transactions.
+
+With INVENTORY_ARCHIVE_PATH set, every connection ATTACHes that SQLite
+file as "archive" (see database.py). run() moves transactions older than
+ARCHIVE_AFTER_DAYS from transactions into archive.transactions, a batch
+at a time, with a pause in between so API writers get the lock.
+
+Each batch is two short BEGIN IMMEDIATE transactions: the copy into the
+archive commits first, then the same ids are deleted from the hot table.
+A commit spanning two WAL-mode files is only atomic per file, so one
+transaction for both could lose rows in a crash between the two files.
+This way a crash leaves at most a batch present in both files, and the
+next run skips the copied rows (INSERT OR IGNORE) and finishes the
+delete.
+
+The daily rollups and stock snapshots stay in the main database and are
+the summary of what was moved: the /reports endpoints read the rollups,
+and a snapshot is taken before the first batch so reconciliation never
+needs archived rows. History endpoints read both tables with
+include_archive=true, through combined().
+
+The archive file is not part of /system/backup or /system/snapshot; back
+it up separately. The newest transaction is never archived, so ids keep
+increasing and cannot collide with archived ones.
+
+    python archive.py run [--days N]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import Column, Index, MetaData, Table, func, select, text, union_all
+from sqlalchemy.orm import Session, aliased
+import models, etags, snapshots
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("INVENTORY_ARCHIVE_AFTER_DAYS", "365"))
+# Rows moved per transaction; smaller batches hold the write lock for less time
+ARCHIVE_BATCH_SIZE = int(os.getenv("INVENTORY_ARCHIVE_BATCH_SIZE", "2000"))
+# Pause between batches, in milliseconds
+ARCHIVE_PAUSE_MS = float(os.getenv("INVENTORY_ARCHIVE_PAUSE_MS", "20"))
+
+metadata = MetaData()
+# Same columns as the transactions table, without its foreign keys (they cannot span database files)
+transactions = Table(
+    "transactions",
+    metadata,
+    *(Column(c.name, c.type, primary_key=c.primary_key) for c in models.Transaction.__table__.columns),
+    Index("ix_archive_transactions_timestamp", "timestamp", "id"),
+    Index("ix_archive_transactions_product_id_timestamp", "product_id", "timestamp"),
+    Index("ix_archive_transactions_vendor_id_timestamp", "vendor_id", "timestamp"),
+    schema="archive",
+)
+
+def attached(connection) -> bool:
+    """Whether the connection (or session) has the archive database attached."""
+    return any(row[1] == "archive" for row in connection.execute(text("PRAGMA database_list")))
+
+def ensure_schema(engine):
+    """
+    Creates archive.transactions if the archive is attached and it does not
+    exist yet, and adds columns the transactions table gained since.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        if attached(conn):
+            metadata.create_all(conn)
+            present = {row[1] for row in conn.execute(text("PRAGMA archive.table_info(transactions)"))}
+            for column in transactions.columns:
+                if column.name not in present:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE archive.transactions ADD COLUMN {column.name} {column_type}"))
+
+def combined(criteria: Callable, limit: Optional[int] = None):
+    """
+    An entity over hot and archived transactions (UNION ALL) that queries
+    use like models.Transaction. criteria(columns) returns the filters
+    applied inside each branch. With `limit`, each branch is cut to its
+    first `limit` rows by (timestamp, id), which is all a page of that
+    size ordered the same way can need.
+    """
+    branches = []
+    for table in (models.Transaction.__table__, transactions):
+        branch = select(*table.c).where(*criteria(table.c))
+        if limit is not None:
+            branch = select(branch.order_by(table.c.timestamp, table.c.id).limit(limit).subquery())
+        branches.append(branch)
+    return aliased(models.Transaction, union_all(*branches).subquery("ledger"))
+
+def _batch(cutoff: datetime, batch_size: int):
+    t = models.Transaction.__table__
+    newest = select(func.max(t.c.id)).scalar_subquery()
+    return (
+        select(t.c.id)
+        .where(t.c.timestamp < cutoff, t.c.id < newest)
+        .order_by(t.c.timestamp, t.c.id)
+        .limit(batch_size)
+    )
+
+def run(engine, older_than_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """
+    Moves transactions older than `older_than_days` into the archive.
+    Safe to re-run after a crash: rows already copied are skipped and
+    then removed from the hot table. Raises RuntimeError if no archive
+    is attached.
+    """
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    t = models.Transaction.__table__
+    ensure_schema(engine)
+
+    with engine.connect() as conn:
+        if not attached(conn):
+            raise RuntimeError("No archive database attached; set INVENTORY_ARCHIVE_PATH")
+        pending = conn.execute(_batch(cutoff, 1)).first() is not None
+        conn.rollback()
+
+        if pending:
+            # Reconciliation starts from each product's latest snapshot; with one
+            # taken now, it never has to read the rows about to be archived
+            with Session(engine) as db:
+                snapshots.take(db)
+                db.commit()
+
+        moved = batches = 0
+        while pending:
+            # The copy is durable in the archive before anything is deleted
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            ids = conn.execute(_batch(cutoff, batch_size)).scalars().all()
+            conn.execute(transactions.insert().prefix_with("OR IGNORE").from_select(
+                [c.name for c in t.columns], select(*t.c).where(t.c.id.in_(ids))
+            ))
+            conn.commit()
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            conn.execute(t.delete().where(t.c.id.in_(ids)))
+            conn.commit()
+            count = len(ids)
+            etags.bump("transactions")
+            moved += count
+            batches += 1
+            pending = count == batch_size
+            if pending and ARCHIVE_PAUSE_MS > 0:
+                time.sleep(ARCHIVE_PAUSE_MS / 1000)
+
+    return {
+        "cutoff": cutoff,
+        "archived": moved,
+        "batches": batches,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not (args == ["run"] or (len(args) == 3 and args[:2] == ["run", "--days"])):
+        sys.exit("usage: python archive.py run [--days N]")
+    import database, migrations
+    migrations.upgrade(database.engine)
+    days = float(args[2]) if len(args) == 3 else ARCHIVE_AFTER_DAYS
+    try:
+        result = run(database.engine, older_than_days=days)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(f"Archived {result['archived']} transactions older than {result['cutoff']:%Y-%m-%d} "
+          f"in {result['batches']} batches ({result['seconds']} s)")
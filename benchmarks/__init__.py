@@ -0,0 +1,4 @@
+"""
+Benchmarks for the inventory API. Each module is runnable with
+`python -m benchmarks.<module> --help` from the repository root.
+"""
@@ -0,0 +1,98 @@
+"""
+Compares the sync routers with the async (/async) routers at the same
+concurrency against a local uvicorn on a seeded temporary database.
+
+    python -m benchmarks.async_vs_sync --concurrency 64 --duration 10
+
+Prints requests/sec and p50/p99 latency for each stack as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import REPO_ROOT, percentile, wait_until_ready
+from benchmarks.seed import seed
+
+
+async def drive(base_url: str, prefix: str, products: int, concurrency: int, duration: float, write_ratio: float):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker(worker_id):
+            nonlocal errors
+            rng = random.Random(worker_id)
+            while time.perf_counter() < deadline:
+                roll = rng.random()
+                started = time.perf_counter()
+                if roll < write_ratio:
+                    response = await client.post(
+                        f"{prefix}/transactions/",
+                        json={"product_id": rng.randint(1, products), "vendor_id": 1, "quantity": 1},
+                    )
+                elif roll < 0.5:
+                    response = await client.get(f"{prefix}/products/", params={"limit": 50})
+                else:
+                    response = await client.get(f"{prefix}/products/{rng.randint(1, products)}")
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path, products=args.products, transactions=args.transactions)
+
+        env = dict(os.environ, INVENTORY_DATABASE_URL=f"sqlite:///{db_path}")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=REPO_ROOT,
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_until_ready(base_url)
+            results = {}
+            for name, prefix in (("sync", ""), ("async", "/async")):
+                results[name] = asyncio.run(
+                    drive(base_url, prefix, args.products, args.concurrency, args.duration, args.write_ratio)
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps({"concurrency": args.concurrency, "duration_s": args.duration, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
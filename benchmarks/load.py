@@ -0,0 +1,280 @@
+"""
+Mixed read/write load test for the API on a seeded temporary database,
+in-process (httpx ASGI transport) and/or against a local uvicorn.
+
+    python -m benchmarks.load --mode both --concurrency 32 --duration 15 --output load.json
+
+For each mode it runs two phases:
+
+  workload    workers pick a random route for `duration` seconds; writes
+              (single and batch transactions) make up `write_ratio` of them
+  contention  `contention_requests` concurrent +1/-1 transactions against
+              one product, most of them decrements so the stock guard is
+              hit; the final quantity must equal the starting quantity
+              plus the deltas the API accepted
+
+Throughput and p50/p95/p99 latency per route are written to --output as
+JSON, together with the commit, so runs can be compared across commits.
+Exits with status 1 if the contention check fails.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks.common import REPO_ROOT, percentile, wait_until_ready
+
+READ_ROUTES = (
+    "GET /products/",
+    "GET /products/{id}",
+    "GET /products/{id}/transactions",
+    "GET /transactions/",
+    "GET /reports/low-stock",
+    "GET /reports/summary",
+)
+WRITE_ROUTES = (
+    "POST /transactions/",
+    "POST /transactions/batch",
+)
+BATCH_SIZE = 20
+
+
+def request_for(route: str, rng: random.Random, vendors: int, products: int):
+    """The method, URL and JSON body for one call to `route`."""
+    product_id = rng.randint(1, products)
+
+    def item():
+        return {"product_id": rng.randint(1, products), "vendor_id": rng.randint(1, vendors), "quantity": rng.choice((-1, 1, 2))}
+
+    if route == "GET /products/":
+        return "GET", "/products/", {"params": {"limit": 50}}
+    if route == "GET /products/{id}":
+        return "GET", f"/products/{product_id}", {}
+    if route == "GET /products/{id}/transactions":
+        return "GET", f"/products/{product_id}/transactions", {"params": {"limit": 50}}
+    if route == "GET /transactions/":
+        return "GET", "/transactions/", {"params": {"limit": 50}}
+    if route == "GET /reports/low-stock":
+        return "GET", "/reports/low-stock", {"params": {"limit": 50}}
+    if route == "GET /reports/summary":
+        return "GET", "/reports/summary", {}
+    if route == "POST /transactions/":
+        return "POST", "/transactions/", {"json": item()}
+    if route == "POST /transactions/batch":
+        return "POST", "/transactions/batch", {"json": [item() for _ in range(BATCH_SIZE)]}
+    raise ValueError(route)
+
+
+def summarize(latencies, statuses, errors, duration: float):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "requests_per_second": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+async def run_workload(client: httpx.AsyncClient, args):
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    errors = Counter()
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(worker_id):
+        rng = random.Random(args.seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            routes = WRITE_ROUTES if rng.random() < args.write_ratio else READ_ROUTES
+            route = rng.choice(routes)
+            method, url, kwargs = request_for(route, rng, args.vendors, args.products)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                errors[route] += 1
+                continue
+            latencies[route].append(time.perf_counter() - started)
+            statuses[route][response.status_code] += 1
+            # 409 is the stock guard refusing a decrement, not a failure
+            if response.status_code >= 400 and response.status_code != 409:
+                errors[route] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    routes = {
+        route: summarize(latencies[route], statuses[route], errors[route], elapsed)
+        for route in READ_ROUTES + WRITE_ROUTES
+    }
+    all_latencies = [s for samples in latencies.values() for s in samples]
+    total = summarize(all_latencies, sum(statuses.values(), Counter()), sum(errors.values()), elapsed)
+    return {"total": total, "routes": routes}
+
+
+async def run_contention(client: httpx.AsyncClient, args, product_id: int = 1):
+    rng = random.Random(args.seed)
+    requests = args.contention_requests
+    # Three decrements for every increment, so the guard has to refuse some
+    deltas = [-1] * (requests * 3 // 4) + [1] * (requests - requests * 3 // 4)
+    rng.shuffle(deltas)
+
+    # Start low enough that the decrements outnumber the stock on hand
+    start_quantity = requests // 4
+    current = (await client.get(f"/products/{product_id}")).json()["quantity"]
+    if current != start_quantity:
+        response = await client.post(
+            "/transactions/", json={"product_id": product_id, "vendor_id": 1, "quantity": start_quantity - current}
+        )
+        response.raise_for_status()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    outcomes = Counter()
+    accepted = 0
+
+    async def post(delta):
+        nonlocal accepted
+        async with semaphore:
+            response = await client.post(
+                "/transactions/", json={"product_id": product_id, "vendor_id": 1, "quantity": delta}
+            )
+        outcomes[response.status_code] += 1
+        if response.status_code == 200:
+            accepted += delta
+
+    started = time.perf_counter()
+    await asyncio.gather(*(post(delta) for delta in deltas))
+    elapsed = time.perf_counter() - started
+
+    final_quantity = (await client.get(f"/products/{product_id}")).json()["quantity"]
+    expected = start_quantity + accepted
+    return {
+        "product_id": product_id,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "statuses": dict(sorted(outcomes.items())),
+        "start_quantity": start_quantity,
+        "accepted_delta": accepted,
+        "expected_quantity": expected,
+        "final_quantity": final_quantity,
+        "ok": final_quantity == expected and final_quantity >= 0 and set(outcomes) <= {200, 409},
+    }
+
+
+async def run_phases(client: httpx.AsyncClient, args):
+    return {
+        "workload": await run_workload(client, args),
+        "contention": await run_contention(client, args),
+    }
+
+
+def client_limits(args):
+    return httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+
+def run_inprocess(db_path: str, args):
+    import main
+
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_phases(client, args)
+
+    return asyncio.run(go())
+
+
+def run_uvicorn(db_path: str, args):
+    env = dict(os.environ, INVENTORY_DATABASE_URL=f"sqlite:///{db_path}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url)
+
+        async def go():
+            async with httpx.AsyncClient(base_url=base_url, limits=client_limits(args), timeout=60) as client:
+                return await run_phases(client, args)
+
+        return asyncio.run(go())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn", "both"), default="both")
+    parser.add_argument("--vendors", type=int, default=20)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--contention-requests", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", default="benchmark-results.json")
+    args = parser.parse_args()
+
+    modes = ("inprocess", "uvicorn") if args.mode == "both" else (args.mode,)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # database.py reads its settings at import time, and the seeder
+        # imports it through models, so the in-process app's database
+        # has to be chosen before anything from the repo is imported
+        os.environ["INVENTORY_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'inprocess.db')}"
+        from benchmarks.seed import seed
+
+        for mode in modes:
+            # Each mode starts from an identical, freshly seeded database
+            db_path = os.path.join(tmp, f"{mode}.db")
+            seed(db_path, args.vendors, args.products, args.transactions, args.seed)
+            runner = run_inprocess if mode == "inprocess" else run_uvicorn
+            results[mode] = runner(db_path, args)
+
+    report = {
+        "commit": current_commit(),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for mode, result in results.items():
+        total = result["workload"]["total"]
+        contention = result["contention"]
+        print(
+            f"{mode}: {total['requests_per_second']} req/s, p50 {total['p50_ms']} ms, "
+            f"p99 {total['p99_ms']} ms, {total['errors']} errors; contention "
+            f"{'ok' if contention['ok'] else 'FAILED'} "
+            f"(expected {contention['expected_quantity']}, got {contention['final_quantity']})"
+        )
+    print(f"Wrote {args.output}")
+    if not all(result["contention"]["ok"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Creates a SQLite database with the app's schema and synthetic data.
+
+    python -m benchmarks.seed bench.db --vendors 50 --products 5000 --transactions 200000
+"""
+import argparse
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import models
+import migrations
+import rollups
+import snapshots
+
+
+def seed(path: str, vendors: int = 20, products: int = 1000, transactions: int = 10000, seed_value: int = 0):
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+
+    rng = random.Random(seed_value)
+    con = sqlite3.connect(path)
+    with con:
+        con.executemany(
+            "INSERT INTO vendors (id, name, contact_email, phone) VALUES (?, ?, ?, ?)",
+            ((i, f"Vendor {i}", f"vendor{i}@example.com", f"555-{i:04d}") for i in range(1, vendors + 1)),
+        )
+        prices = {i: round(rng.uniform(1, 200), 2) for i in range(1, products + 1)}
+        con.executemany(
+            "INSERT INTO products (id, name, description, price, quantity, vendor_id, is_low_stock) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (i, f"Product {i}", f"Synthetic product number {i}", prices[i], q, rng.randint(1, vendors), q < models.DEFAULT_REORDER_THRESHOLD)
+                for i, q in ((i, rng.randint(0, 500)) for i in range(1, products + 1))
+            ),
+        )
+        start = datetime.utcnow() - timedelta(days=365)
+        step = timedelta(days=365) / max(transactions, 1)
+
+        def rows():
+            for i in range(1, transactions + 1):
+                product_id = rng.randint(1, products)
+                quantity = rng.choice((-3, -2, -1, 1, 2, 5, 10))
+                yield (i, product_id, rng.randint(1, vendors), quantity, prices[product_id] * quantity, start + step * i)
+
+        con.executemany(
+            "INSERT INTO transactions (id, product_id, vendor_id, quantity, total_cost, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            ((i, p, v, q, c, ts.strftime("%Y-%m-%d %H:%M:%S.%f")) for i, p, v, q, c, ts in rows()),
+        )
+    con.close()
+
+    # The rows above bypass crud.py, so derive the rollups and stock snapshots here
+    with Session(engine) as db:
+        rollups.rebuild(db)
+        snapshots.take(db)
+        db.commit()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--vendors", type=int, default=20)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    seed(args.path, args.vendors, args.products, args.transactions, args.seed)
+
+
+if __name__ == "__main__":
+    main()
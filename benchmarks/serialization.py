@@ -0,0 +1,65 @@
+"""
+Times large list responses with and without the fast JSON path
+(fastjson.py) in-process, on a seeded temporary database.
+
+    python -m benchmarks.serialization --products 100000 --limits 1000 10000 100000
+
+Prints the median time and body size per route, limit and mode as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def time_route(client, url: str, repeat: int):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+        size = len(response.content)
+    return {"median_ms": round(statistics.median(timings) * 1000, 2), "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        # database.py reads its settings at import time, and the seeder
+        # imports it through models, so configure the environment first
+        os.environ["INVENTORY_DATABASE_URL"] = f"sqlite:///{db_path}"
+        os.environ["INVENTORY_ETAGS"] = "0"
+        from fastapi.testclient import TestClient
+        from benchmarks.seed import seed
+        import fastjson
+        import main as app_main
+
+        seed(db_path, products=args.products, transactions=args.transactions)
+
+        results = []
+        with TestClient(app_main.app) as client:
+            for route in ("/products/", "/transactions/"):
+                for limit in args.limits:
+                    row = {"route": route, "limit": limit}
+                    for mode, enabled in (("response_model", False), ("fast", True)):
+                        fastjson.ENABLED = enabled
+                        row[mode] = time_route(client, f"{route}?limit={limit}", args.repeat)
+                    row["speedup"] = round(row["response_model"]["median_ms"] / row["fast"]["median_ms"], 2)
+                    results.append(row)
+
+    print(json.dumps({"orjson": fastjson.orjson is not None, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
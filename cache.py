@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+import oncommit
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries also expire ttl seconds after
+    being set. A ttl of 0 disables caching. Counts hits and misses.
+
+    `generation` changes on every invalidation; pass the value read before a
+    database lookup to set() so a result that raced with a write is dropped.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation=None):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+# --- Entity cache ---
+# Detached copies of Product and Vendor rows, keyed by id. Writers in crud.py
+# invalidate entries through invalidate_on_commit so reads in this process
+# never see stock older than the last committed write.
+ENTITY_CACHE_SIZE = int(os.getenv("INVENTORY_ENTITY_CACHE_SIZE", "10000"))
+ENTITY_CACHE_TTL = float(os.getenv("INVENTORY_ENTITY_CACHE_TTL", "30"))
+
+product_cache = TTLCache(ttl=ENTITY_CACHE_TTL, maxsize=ENTITY_CACHE_SIZE)
+vendor_cache = TTLCache(ttl=ENTITY_CACHE_TTL, maxsize=ENTITY_CACHE_SIZE)
+
+def detached_copy(obj):
+    """A session-free copy of a loaded ORM object's column values, suitable for Session.merge(load=False)."""
+    mapper = inspect(obj).mapper
+    copy = mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+def invalidate_on_commit(db: Session, cache: TTLCache, key=None):
+    """
+    Drops `key` (or everything, when key is None) from `cache` now and again
+    once the session commits, so readers racing the write cannot re-cache
+    the old row.
+    """
+    _invalidate(cache, key)
+    oncommit.defer(db, _apply_invalidations, (cache, key))
+
+def _invalidate(cache: TTLCache, key):
+    if key is None:
+        cache.clear()
+    else:
+        cache.invalidate(key)
+
+def _apply_invalidations(invalidations):
+    for cache, key in invalidations:
+        _invalidate(cache, key)
@@ -0,0 +1,55 @@
+"""
+Commit-ordered change sequence behind /system/backup?since=.
+
+Every insert or update of a vendor, product or transaction, and every
+tombstone, takes the next number from the one-row change_sequence table
+into the row's change_seq column. Triggers do this inside the writing
+statement, so every write path (crud, CSV import, restore, raw SQL) is
+covered.
+
+SQLite runs one write transaction at a time, from its first write to its
+commit. So the numbers a transaction takes are all higher than those of
+every transaction committed before it, and all lower than those of
+every transaction committed after it, however long it runs. A backup
+reads current() before any row. Every row it misses then has a higher
+number, and the next backup with since=<that value> picks it up. Unlike
+a wall-clock watermark, this needs no overlap.
+
+The numbers are local to one database file: restored rows get new
+numbers here, whatever they had at the source.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Tables whose rows carry change_seq
+TRACKED_TABLES = ("vendors", "products", "transactions", "tombstones")
+
+SEQUENCE_DDL = (
+    "CREATE TABLE IF NOT EXISTS change_sequence (value INTEGER NOT NULL)",
+    "INSERT INTO change_sequence (value) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM change_sequence)",
+)
+
+# SQLite does not fire a trigger from its own body (recursive_triggers is
+# off), so the inner UPDATE does not number the row again
+TRIGGER_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS {table}_change_{name} AFTER {event} ON {table} BEGIN "
+    "UPDATE change_sequence SET value = value + 1; "
+    "UPDATE {table} SET change_seq = (SELECT value FROM change_sequence) WHERE id = new.id; "
+    "END"
+)
+
+def ensure_schema(engine):
+    """Creates the sequence and the triggers that maintain change_seq, if missing."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for ddl in SEQUENCE_DDL:
+            conn.execute(text(ddl))
+        for table in TRACKED_TABLES:
+            events = ("INSERT",) if table == "tombstones" else ("INSERT", "UPDATE")
+            for event in events:
+                conn.execute(text(TRIGGER_DDL.format(table=table, event=event, name=event.lower())))
+
+def current(db: Session) -> int:
+    """The highest committed change number, the watermark for the next delta backup."""
+    return db.execute(text("SELECT value FROM change_sequence")).scalar() or 0
@@ -1,12 +1,51 @@
+from sqlalchemy import func, or_, tuple_, update
 from sqlalchemy.orm import Session
-import models, schemas
+from typing import List, Optional, Tuple
+from datetime import datetime
+import models, schemas, rollups, cache, etags, snapshots, events, archive
+
+# Ids per IN (...) list in batch lookups, well under SQLite's bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+def chunks(ids: list, size: int = IN_CHUNK_SIZE):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+class InsufficientStockError(Exception):
+    """Raised when a stock change would take a product's quantity below zero."""
+
+    def __init__(self, product_id: int, quantity_change: int):
+        self.product_id = product_id
+        self.quantity_change = quantity_change
+        super().__init__(f"Insufficient stock for product {product_id} to apply {quantity_change}")
+
+def record_tombstone(db: Session, table_name: str, row_id: int):
+    """Notes a deleted row so incremental backups (/system/backup?since=) can replay the delete."""
+    db.add(models.Tombstone(table_name=table_name, row_id=row_id))
 
 # --- Vendor CRUD ---
+def _cached_get(db: Session, entity_cache: cache.TTLCache, model, entity_id: int):
+    # Hits are attached to the session with merge(load=False), which issues no SQL
+    cached = entity_cache.get(entity_id)
+    if cached is not None:
+        return db.merge(cached, load=False)
+    generation = entity_cache.generation
+    entity = db.query(model).filter(model.id == entity_id).first()
+    if entity is not None:
+        entity_cache.set(entity_id, cache.detached_copy(entity), generation)
+    return entity
+
 def get_vendor(db: Session, vendor_id: int):
-    return db.query(models.Vendor).filter(models.Vendor.id == vendor_id).first()
+    return _cached_get(db, cache.vendor_cache, models.Vendor, vendor_id)
 
-def get_vendors(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Vendor).offset(skip).limit(limit).all()
+def get_vendors(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, columns: Optional[list] = None):
+    # after_id pages by primary key (keyset), which costs the same on every page;
+    # skip is kept for callers that still page by offset.
+    # columns selects plain row tuples instead of ORM objects (see fastjson.py)
+    query = db.query(*(columns or [models.Vendor])).order_by(models.Vendor.id)
+    if after_id is not None:
+        return query.filter(models.Vendor.id > after_id).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 def create_vendor(db: Session, vendor: schemas.VendorCreate):
     db_vendor = models.Vendor(
@@ -15,6 +54,7 @@ def create_vendor(db: Session, vendor: schemas.VendorCreate):
         phone=vendor.phone
     )
     db.add(db_vendor)
+    etags.bump_on_commit(db, "vendors")
     db.commit()
     db.refresh(db_vendor)
     return db_vendor
@@ -23,16 +63,32 @@ def delete_vendor(db: Session, vendor_id: int):
     vendor = db.query(models.Vendor).filter(models.Vendor.id == vendor_id).first()
     if vendor:
         db.delete(vendor)
+        record_tombstone(db, "vendors", vendor_id)
+        cache.invalidate_on_commit(db, cache.vendor_cache, vendor_id)
+        # deleting a vendor detaches its products (vendor_id is set to NULL)
+        cache.invalidate_on_commit(db, cache.product_cache)
+        etags.bump_on_commit(db, "vendors", "products", "transactions")
         db.commit()
         return True
     return False
 
 # --- Product CRUD ---
 def get_product(db: Session, product_id: int):
-    return db.query(models.Product).filter(models.Product.id == product_id).first()
+    return _cached_get(db, cache.product_cache, models.Product, product_id)
+
+def get_products(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, columns: Optional[list] = None):
+    query = db.query(*(columns or [models.Product])).filter(models.Product.vendor_id.isnot(None)).order_by(models.Product.id)
+    if after_id is not None:
+        return query.filter(models.Product.id > after_id).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+def is_low_stock(quantity: int, reorder_threshold: Optional[int]) -> bool:
+    threshold = models.DEFAULT_REORDER_THRESHOLD if reorder_threshold is None else reorder_threshold
+    return quantity < threshold
 
-def get_products(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Product).filter(models.Product.vendor_id.isnot(None)).offset(skip).limit(limit).all()
+def low_stock_expression(quantity):
+    """SQL counterpart of is_low_stock for a quantity expression."""
+    return quantity < func.coalesce(models.Product.reorder_threshold, models.DEFAULT_REORDER_THRESHOLD)
 
 def create_product(db: Session, product: schemas.ProductCreate):
     db_product = models.Product(
@@ -40,32 +96,167 @@ def create_product(db: Session, product: schemas.ProductCreate):
         description=product.description,
         price=product.price,
         quantity=product.quantity,
-        vendor_id=product.vendor_id
+        vendor_id=product.vendor_id,
+        reorder_threshold=product.reorder_threshold,
+        is_low_stock=is_low_stock(product.quantity, product.reorder_threshold)
     )
     db.add(db_product)
+    db.flush()
+    db.add(snapshots.opening_snapshot(db_product.id, db_product.quantity))
+    etags.bump_on_commit(db, "products")
+    events.publish_on_commit(db, "product_created", product_event(db_product))
     db.commit()
     db.refresh(db_product)
     return db_product
 
+def stock_change_statement(product_id: int, quantity_change: int):
+    """
+    Adds quantity_change to a product inside the database as a single
+    UPDATE, so concurrent writers cannot overwrite each other's changes.
+    Decreases only apply while the result stays non-negative.
+    The low-stock flag is recomputed in the same statement, which returns
+    the new quantity, reorder_threshold and vendor_id (no row if refused).
+    """
+    new_quantity = models.Product.quantity + quantity_change
+    stmt = (
+        update(models.Product)
+        .where(models.Product.id == product_id)
+        .values(quantity=new_quantity, is_low_stock=low_stock_expression(new_quantity))
+    )
+    if quantity_change < 0:
+        stmt = stmt.where(models.Product.quantity + quantity_change >= 0)
+    stmt = stmt.returning(models.Product.quantity, models.Product.reorder_threshold, models.Product.vendor_id)
+    return stmt.execution_options(synchronize_session=False)
+
+# --- Events ---
+def product_event(product: models.Product) -> dict:
+    return {
+        "product_id": product.id,
+        "vendor_id": product.vendor_id,
+        "name": product.name,
+        "price": product.price,
+        "quantity": product.quantity,
+        "reorder_threshold": product.reorder_threshold,
+        "is_low_stock": product.is_low_stock,
+    }
+
+def transaction_event(transaction: models.Transaction) -> dict:
+    return {
+        "id": transaction.id,
+        "product_id": transaction.product_id,
+        "vendor_id": transaction.vendor_id,
+        "quantity": transaction.quantity,
+        "total_cost": transaction.total_cost,
+        "timestamp": transaction.timestamp,
+    }
+
+def publish_stock_change(db: Session, product_id: int, quantity_change: int, row):
+    """Queues quantity_changed, and low_stock_changed if the flag flipped, from a stock_change_statement row."""
+    quantity, reorder_threshold, vendor_id = row
+    events.publish_on_commit(db, "quantity_changed", {
+        "product_id": product_id, "vendor_id": vendor_id, "quantity": quantity, "change": quantity_change,
+    })
+    low = is_low_stock(quantity, reorder_threshold)
+    if low != is_low_stock(quantity - quantity_change, reorder_threshold):
+        events.publish_on_commit(db, "low_stock_changed", {
+            "product_id": product_id, "vendor_id": vendor_id, "quantity": quantity,
+            "reorder_threshold": reorder_threshold, "is_low_stock": low,
+        })
+
+def _apply_stock_change(db: Session, product_id: int, quantity_change: int):
+    # False if the product is missing or the change was refused
+    cache.invalidate_on_commit(db, cache.product_cache, product_id)
+    etags.bump_on_commit(db, "products")
+    row = db.execute(stock_change_statement(product_id, quantity_change)).first()
+    if row is None:
+        return False
+    publish_stock_change(db, product_id, quantity_change, row)
+    return True
+
 def update_product_quantity(db: Session, product_id: int, quantity_change: int):
     product = get_product(db, product_id)
     if product:
-        product.quantity += quantity_change
+        if not _apply_stock_change(db, product_id, quantity_change):
+            db.rollback()
+            raise InsufficientStockError(product_id, quantity_change)
+        db.commit()
+        db.refresh(product)
+    return product
+
+def set_reorder_threshold(db: Session, product_id: int, reorder_threshold: Optional[int]):
+    product = get_product(db, product_id)
+    if product:
+        was_low = product.is_low_stock
+        product.reorder_threshold = reorder_threshold
+        cache.invalidate_on_commit(db, cache.product_cache, product_id)
+        etags.bump_on_commit(db, "products")
+        db.flush()
+        quantity, vendor_id, low = db.execute(
+            update(models.Product)
+            .where(models.Product.id == product_id)
+            .values(is_low_stock=low_stock_expression(models.Product.quantity))
+            .returning(models.Product.quantity, models.Product.vendor_id, models.Product.is_low_stock)
+            .execution_options(synchronize_session=False)
+        ).one()
+        if low != was_low:
+            events.publish_on_commit(db, "low_stock_changed", {
+                "product_id": product_id, "vendor_id": vendor_id, "quantity": quantity,
+                "reorder_threshold": reorder_threshold, "is_low_stock": low,
+            })
         db.commit()
         db.refresh(product)
     return product
 
+def refresh_low_stock_flags(db: Session):
+    """Recomputes is_low_stock for every product, e.g. after rows were inserted in bulk."""
+    cache.invalidate_on_commit(db, cache.product_cache)
+    etags.bump_on_commit(db, "products")
+    flag = low_stock_expression(models.Product.quantity)
+    # Only rows whose flag is wrong, so updated_at moves only for real changes
+    db.execute(
+        update(models.Product)
+        .where(or_(models.Product.is_low_stock.is_(None), models.Product.is_low_stock != flag))
+        .values(is_low_stock=flag)
+        .execution_options(synchronize_session=False)
+    )
+
+def get_low_stock_products(db: Session, threshold: Optional[int] = None, skip: int = 0, limit: int = 100, sort: str = "quantity", columns: Optional[list] = None):
+    """
+    Products below `threshold`, or below their own reorder threshold when
+    `threshold` is None. Both filters are served by an index
+    (ix_products_quantity / ix_products_is_low_stock_quantity). Like
+    get_products, leaves out products whose vendor was deleted.
+    """
+    query = db.query(*(columns or [models.Product])).filter(models.Product.vendor_id.isnot(None))
+    if threshold is None:
+        query = query.filter(models.Product.is_low_stock.is_(True))
+    else:
+        query = query.filter(models.Product.quantity < threshold)
+    column = getattr(models.Product, sort.lstrip("-"))
+    order = column.desc() if sort.startswith("-") else column.asc()
+    return query.order_by(order, models.Product.id).offset(skip).limit(limit).all()
+
 def delete_product(db: Session, product_id: int):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if product:
         db.delete(product)
+        record_tombstone(db, "products", product_id)
+        snapshots.forget(db, [product_id])
+        cache.invalidate_on_commit(db, cache.product_cache, product_id)
+        # the product's transactions are detached (product_id is set to NULL)
+        etags.bump_on_commit(db, "products", "transactions")
+        events.publish_on_commit(db, "product_deleted", {"product_id": product_id, "vendor_id": product.vendor_id})
         db.commit()
         return True
     return False
 
 # --- Transaction CRUD ---
-def create_transaction(db: Session, transaction: schemas.TransactionCreate):
-
+def stage_transaction(db: Session, transaction: schemas.TransactionCreate):
+    """
+    create_transaction without the commit, for callers that commit several
+    writes together (groupcommit.py). Raises InsufficientStockError without
+    rolling back.
+    """
     product = get_product(db, transaction.product_id)
     if not product:
         return None
@@ -76,18 +267,124 @@ def create_transaction(db: Session, transaction: schemas.TransactionCreate):
         product_id=transaction.product_id,
         vendor_id=transaction.vendor_id,
         quantity=transaction.quantity,
-        total_cost=total_cost
+        total_cost=total_cost,
+        timestamp=datetime.utcnow()
     )
+    if not _apply_stock_change(db, product.id, transaction.quantity):
+        raise InsufficientStockError(transaction.product_id, transaction.quantity)
     db.add(db_transaction)
-    
-    product.quantity += transaction.quantity
-    
+    rollups.record(db, [db_transaction])
+    etags.bump_on_commit(db, "transactions")
+    # Flushed here so the event carries the new id
+    db.flush()
+    events.publish_on_commit(db, "transaction_created", transaction_event(db_transaction))
+    return db_transaction
+
+def create_transaction(db: Session, transaction: schemas.TransactionCreate):
+    try:
+        db_transaction = stage_transaction(db, transaction)
+    except InsufficientStockError:
+        db.rollback()
+        raise
+    if db_transaction is None:
+        return None
+
     db.commit()
     db.refresh(db_transaction)
     return db_transaction
 
-def get_transactions(db: Session, skip: int = 0, limit: int = 100):
-    return (
-        db.query(models.Transaction).filter(models.Transaction.product_id.isnot(None)).offset(skip).limit(limit).all()
-    )
+def create_transactions(db: Session, transactions: List[schemas.TransactionCreate]):
+    """
+    Records many transactions with one product lookup and one commit.
+    Returns a list aligned with the input holding the new Transaction,
+    or None where the product does not exist, or an InsufficientStockError
+    where the item would have taken stock below zero.
+    """
+    product_ids = list({t.product_id for t in transactions})
+    products = {
+        p.id: p
+        for chunk in chunks(product_ids)
+        for p in db.query(models.Product).filter(models.Product.id.in_(chunk))
+    }
+
+    now = datetime.utcnow()
+    results = []
+    for transaction in transactions:
+        product = products.get(transaction.product_id)
+        if product is None:
+            results.append(None)
+            continue
+        # Items are applied in order, each with its own guarded UPDATE
+        if not _apply_stock_change(db, product.id, transaction.quantity):
+            results.append(InsufficientStockError(product.id, transaction.quantity))
+            continue
+        db_transaction = models.Transaction(
+            product_id=transaction.product_id,
+            vendor_id=transaction.vendor_id,
+            quantity=transaction.quantity,
+            total_cost=product.price * transaction.quantity,
+            timestamp=now
+        )
+        db.add(db_transaction)
+        results.append(db_transaction)
+
+    created = [t for t in results if isinstance(t, models.Transaction)]
+    rollups.record(db, created)
+    etags.bump_on_commit(db, "transactions")
+    db.flush()
+    ids = [t.id for t in created]
+    for t in created:
+        events.publish_on_commit(db, "transaction_created", transaction_event(t))
+    db.commit()
+
+    # Reload the committed rows in a few IN queries instead of one refresh() per row
+    for chunk in chunks(ids):
+        db.query(models.Transaction).filter(models.Transaction.id.in_(chunk)).all()
+    return results
+
+def _transaction_filters(
+    t,
+    after: Optional[Tuple[datetime, int]] = None,
+    product_id: Optional[int] = None,
+    vendor_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    # t is models.Transaction or a transactions table's columns (see archive.combined)
+    criteria = [t.product_id == product_id if product_id is not None else t.product_id.isnot(None)]
+    if vendor_id is not None:
+        criteria.append(t.vendor_id == vendor_id)
+    if start is not None:
+        criteria.append(t.timestamp >= start)
+    if end is not None:
+        criteria.append(t.timestamp < end)
+    if after is not None:
+        criteria.append(tuple_(t.timestamp, t.id) > tuple_(*after))
+    return criteria
 
+def get_transactions(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+    product_id: Optional[int] = None,
+    vendor_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[list] = None,
+    include_archive: bool = False,
+):
+    # Ordered by (timestamp, id) so `after` can seek straight into ix_transactions_timestamp,
+    # or into ix_transactions_product_id_timestamp / ix_transactions_vendor_id_timestamp when filtered
+    filters = dict(after=after, product_id=product_id, vendor_id=vendor_id, start=start, end=end)
+    if include_archive and archive.attached(db):
+        # Each side of the UNION ALL is filtered and cut to the page on its own indexes
+        t = archive.combined(lambda c: _transaction_filters(c, **filters), limit=limit if after is not None else skip + limit)
+        query = db.query(*([getattr(t, c.key) for c in columns] if columns else [t]))
+    else:
+        t = models.Transaction
+        query = db.query(*(columns or [t])).filter(*_transaction_filters(t, **filters))
+    query = query.order_by(t.timestamp, t.id)
+    if after is not None:
+        return query.limit(limit).all()
+    return query.offset(skip).limit(limit).all()
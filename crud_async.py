@@ -0,0 +1,193 @@
+"""
+Async counterparts of the functions in crud.py, for AsyncSession.
+They return the same objects and raise the same errors.
+"""
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from datetime import datetime
+import models, schemas, rollups, cache, etags, snapshots, events
+from crud import (
+    InsufficientStockError, chunks, is_low_stock, record_tombstone, stock_change_statement,
+    product_event, transaction_event, publish_stock_change,
+)
+
+async def _cached_get(db: AsyncSession, entity_cache: cache.TTLCache, model, entity_id: int):
+    cached = entity_cache.get(entity_id)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+    generation = entity_cache.generation
+    entity = await db.get(model, entity_id)
+    if entity is not None:
+        entity_cache.set(entity_id, cache.detached_copy(entity), generation)
+    return entity
+
+# --- Vendor CRUD ---
+async def get_vendor(db: AsyncSession, vendor_id: int):
+    return await _cached_get(db, cache.vendor_cache, models.Vendor, vendor_id)
+
+async def get_vendors(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    query = select(models.Vendor).order_by(models.Vendor.id)
+    if after_id is not None:
+        query = query.filter(models.Vendor.id > after_id)
+    else:
+        query = query.offset(skip)
+    return (await db.scalars(query.limit(limit))).all()
+
+async def create_vendor(db: AsyncSession, vendor: schemas.VendorCreate):
+    db_vendor = models.Vendor(
+        name=vendor.name,
+        contact_email=vendor.contact_email,
+        phone=vendor.phone
+    )
+    db.add(db_vendor)
+    etags.bump_on_commit(db.sync_session, "vendors")
+    await db.commit()
+    return db_vendor
+
+async def delete_vendor(db: AsyncSession, vendor_id: int):
+    vendor = await get_vendor(db, vendor_id)
+    if vendor:
+        await db.delete(vendor)
+        record_tombstone(db.sync_session, "vendors", vendor_id)
+        cache.invalidate_on_commit(db.sync_session, cache.vendor_cache, vendor_id)
+        cache.invalidate_on_commit(db.sync_session, cache.product_cache)
+        etags.bump_on_commit(db.sync_session, "vendors", "products", "transactions")
+        await db.commit()
+        return True
+    return False
+
+# --- Product CRUD ---
+async def get_product(db: AsyncSession, product_id: int):
+    return await _cached_get(db, cache.product_cache, models.Product, product_id)
+
+async def get_products(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    query = select(models.Product).filter(models.Product.vendor_id.isnot(None)).order_by(models.Product.id)
+    if after_id is not None:
+        query = query.filter(models.Product.id > after_id)
+    else:
+        query = query.offset(skip)
+    return (await db.scalars(query.limit(limit))).all()
+
+async def create_product(db: AsyncSession, product: schemas.ProductCreate):
+    db_product = models.Product(
+        name=product.name,
+        description=product.description,
+        price=product.price,
+        quantity=product.quantity,
+        vendor_id=product.vendor_id,
+        reorder_threshold=product.reorder_threshold,
+        is_low_stock=is_low_stock(product.quantity, product.reorder_threshold)
+    )
+    db.add(db_product)
+    await db.flush()
+    db.add(snapshots.opening_snapshot(db_product.id, db_product.quantity))
+    etags.bump_on_commit(db.sync_session, "products")
+    events.publish_on_commit(db.sync_session, "product_created", product_event(db_product))
+    await db.commit()
+    return db_product
+
+async def _apply_stock_change(db: AsyncSession, product_id: int, quantity_change: int):
+    cache.invalidate_on_commit(db.sync_session, cache.product_cache, product_id)
+    etags.bump_on_commit(db.sync_session, "products")
+    row = (await db.execute(stock_change_statement(product_id, quantity_change))).first()
+    if row is None:
+        return False
+    publish_stock_change(db.sync_session, product_id, quantity_change, row)
+    return True
+
+async def update_product_quantity(db: AsyncSession, product_id: int, quantity_change: int):
+    product = await get_product(db, product_id)
+    if product:
+        if not await _apply_stock_change(db, product_id, quantity_change):
+            await db.rollback()
+            raise InsufficientStockError(product_id, quantity_change)
+        await db.commit()
+        await db.refresh(product)
+    return product
+
+async def delete_product(db: AsyncSession, product_id: int):
+    product = await get_product(db, product_id)
+    if product:
+        await db.delete(product)
+        record_tombstone(db.sync_session, "products", product_id)
+        await db.run_sync(snapshots.forget, [product_id])
+        cache.invalidate_on_commit(db.sync_session, cache.product_cache, product_id)
+        etags.bump_on_commit(db.sync_session, "products", "transactions")
+        events.publish_on_commit(db.sync_session, "product_deleted", {"product_id": product_id, "vendor_id": product.vendor_id})
+        await db.commit()
+        return True
+    return False
+
+# --- Transaction CRUD ---
+async def create_transaction(db: AsyncSession, transaction: schemas.TransactionCreate):
+    product = await get_product(db, transaction.product_id)
+    if not product:
+        return None
+
+    db_transaction = models.Transaction(
+        product_id=transaction.product_id,
+        vendor_id=transaction.vendor_id,
+        quantity=transaction.quantity,
+        total_cost=product.price * transaction.quantity,
+        timestamp=datetime.utcnow()
+    )
+    if not await _apply_stock_change(db, product.id, transaction.quantity):
+        await db.rollback()
+        raise InsufficientStockError(transaction.product_id, transaction.quantity)
+    db.add(db_transaction)
+    await db.run_sync(rollups.record, [db_transaction])
+    etags.bump_on_commit(db.sync_session, "transactions")
+    await db.flush()
+    events.publish_on_commit(db.sync_session, "transaction_created", transaction_event(db_transaction))
+
+    await db.commit()
+    return db_transaction
+
+async def create_transactions(db: AsyncSession, transactions: List[schemas.TransactionCreate]):
+    product_ids = list({t.product_id for t in transactions})
+    products = {}
+    for chunk in chunks(product_ids):
+        for p in await db.scalars(select(models.Product).filter(models.Product.id.in_(chunk))):
+            products[p.id] = p
+
+    now = datetime.utcnow()
+    results = []
+    for transaction in transactions:
+        product = products.get(transaction.product_id)
+        if product is None:
+            results.append(None)
+            continue
+        if not await _apply_stock_change(db, product.id, transaction.quantity):
+            results.append(InsufficientStockError(product.id, transaction.quantity))
+            continue
+        db_transaction = models.Transaction(
+            product_id=transaction.product_id,
+            vendor_id=transaction.vendor_id,
+            quantity=transaction.quantity,
+            total_cost=product.price * transaction.quantity,
+            timestamp=now
+        )
+        db.add(db_transaction)
+        results.append(db_transaction)
+
+    created = [t for t in results if isinstance(t, models.Transaction)]
+    await db.run_sync(rollups.record, created)
+    etags.bump_on_commit(db.sync_session, "transactions")
+    await db.flush()
+    for t in created:
+        events.publish_on_commit(db.sync_session, "transaction_created", transaction_event(t))
+    await db.commit()
+    return results
+
+async def get_transactions(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[Tuple[datetime, int]] = None):
+    query = (
+        select(models.Transaction)
+        .filter(models.Transaction.product_id.isnot(None))
+        .order_by(models.Transaction.timestamp, models.Transaction.id)
+    )
+    if after is not None:
+        query = query.filter(tuple_(models.Transaction.timestamp, models.Transaction.id) > tuple_(*after))
+    else:
+        query = query.offset(skip)
+    return (await db.scalars(query.limit(limit))).all()
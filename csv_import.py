@@ -0,0 +1,238 @@
+"""
+Bulk CSV import of vendors and products.
+
+The upload is parsed one row at a time and each row is validated against
+schemas.VendorCreate / ProductCreate. Valid rows are written in chunks:
+one query finds which rows already exist by natural key, then one
+executemany UPDATE and one executemany INSERT, then a commit. Memory use
+is bounded by the chunk size and the set of keys already imported, not
+the file size.
+
+Vendors are matched by name; an existing vendor gets the row's
+contact_email and phone. Products are matched by (vendor_id, name); an
+existing product gets the row's price, and its description and
+reorder_threshold when those cells are not empty, while quantity only
+seeds new products (stock moves through transactions). Within a file,
+the last row for a key wins; the earlier ones, in any chunk, are counted
+as duplicates rather than updates.
+"""
+import csv
+import io
+import time
+from typing import Optional
+from pydantic import ValidationError
+from sqlalchemy import bindparam, func
+from sqlalchemy.orm import Session
+import models, schemas, crud, cache, etags, events, snapshots
+
+# Valid rows are written and committed this many at a time
+IMPORT_CHUNK_SIZE = 1000
+# Keeps the "IN (...)" lookups well under SQLite's bound parameter limit
+IMPORT_MAX_CHUNK_SIZE = 10000
+# Per-row errors beyond this many are counted but not listed
+MAX_REPORTED_ERRORS = 1000
+
+class ImportReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        # Rows superseded by a later row for the same key in the file
+        self.duplicates = 0
+        # Keys written by earlier chunks of this import
+        self.keys = set()
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+        }
+
+def _format_errors(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+def _parse(stream, schema, report: ImportReport, defaults: dict):
+    """Yields (line number, validated row) for each valid CSV row, recording the rest as failures."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    fields = set(schema.model_fields)
+    try:
+        if reader.fieldnames is None or "name" not in reader.fieldnames:
+            raise ValueError("CSV header must include a 'name' column")
+        for row in reader:
+            report.rows += 1
+            # Empty cells mean "not given", so optional fields fall back to their defaults
+            values = {**defaults, **{k: v for k, v in row.items() if k in fields and v not in ("", None)}}
+            try:
+                yield reader.line_num, schema(**values)
+            except ValidationError as e:
+                report.fail(reader.line_num, _format_errors(e))
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Unreadable CSV at line {reader.line_num}: {e}")
+
+def _chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _latest_by_key(chunk, key, report: ImportReport):
+    # Earlier rows for a key, in this chunk or an earlier one, are superseded by later ones
+    latest = {}
+    for line, item in chunk:
+        if key(item) in latest or key(item) in report.keys:
+            report.duplicates += 1
+        latest[key(item)] = (line, item)
+    return latest
+
+def _count(report: ImportReport, latest, existing, inserted: int):
+    # A key written by an earlier chunk was already counted there
+    report.updated += sum(1 for key in latest if key in existing and key not in report.keys)
+    report.inserted += inserted
+    report.keys.update(latest)
+
+def _write_vendors(db: Session, chunk, report: ImportReport):
+    table = models.Vendor.__table__
+    latest = _latest_by_key(chunk, lambda v: v.name, report)
+    existing = dict(
+        db.query(models.Vendor.name, func.min(models.Vendor.id))
+        .filter(models.Vendor.name.in_(list(latest)))
+        .group_by(models.Vendor.name)
+    )
+
+    updates, inserts = [], []
+    for name, (line, vendor) in latest.items():
+        if name in existing:
+            updates.append({"b_id": existing[name], "contact_email": vendor.contact_email, "phone": vendor.phone})
+        else:
+            inserts.append({"name": name, "contact_email": vendor.contact_email, "phone": vendor.phone})
+
+    if updates:
+        db.execute(table.update().where(table.c.id == bindparam("b_id")), updates)
+        cache.invalidate_on_commit(db, cache.vendor_cache)
+    if inserts:
+        db.execute(table.insert(), inserts)
+    etags.bump_on_commit(db, "vendors")
+    db.commit()
+    _count(report, latest, existing, len(inserts))
+
+def _write_products(db: Session, chunk, report: ImportReport):
+    table = models.Product.__table__
+    vendor_ids = {product.vendor_id for _, product in chunk}
+    known_vendors = {
+        vendor_id for (vendor_id,) in db.query(models.Vendor.id).filter(models.Vendor.id.in_(vendor_ids))
+    }
+    valid = []
+    for line, product in chunk:
+        if product.vendor_id in known_vendors:
+            valid.append((line, product))
+        else:
+            report.fail(line, f"vendor_id: Vendor {product.vendor_id} not found")
+
+    latest = _latest_by_key(valid, lambda p: (p.vendor_id, p.name), report)
+    if not latest:
+        return
+    existing = {}
+    for product_id, vendor_id, name in (
+        db.query(models.Product.id, models.Product.vendor_id, models.Product.name)
+        .filter(
+            models.Product.vendor_id.in_({vendor_id for vendor_id, _ in latest}),
+            models.Product.name.in_({name for _, name in latest}),
+        )
+        .order_by(models.Product.id.desc())
+    ):
+        existing[(vendor_id, name)] = product_id  # lowest id wins
+
+    updates, inserts = [], []
+    for key, (line, product) in latest.items():
+        if key in existing:
+            updates.append({
+                "b_id": existing[key],
+                "b_description": product.description,
+                "b_price": product.price,
+                "b_threshold": product.reorder_threshold,
+            })
+        else:
+            inserts.append({
+                "name": product.name,
+                "description": product.description,
+                "price": product.price,
+                "quantity": product.quantity,
+                "vendor_id": product.vendor_id,
+                "reorder_threshold": product.reorder_threshold,
+                "is_low_stock": crud.is_low_stock(product.quantity, product.reorder_threshold),
+            })
+
+    if updates:
+        threshold = func.coalesce(bindparam("b_threshold"), table.c.reorder_threshold)
+        db.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                # Empty optional cells keep the current value
+                description=func.coalesce(bindparam("b_description"), table.c.description),
+                price=bindparam("b_price"),
+                reorder_threshold=threshold,
+                # SET expressions see the old row, so repeat the new threshold here
+                is_low_stock=table.c.quantity < func.coalesce(threshold, models.DEFAULT_REORDER_THRESHOLD),
+            ),
+            updates,
+        )
+        cache.invalidate_on_commit(db, cache.product_cache)
+    if inserts:
+        db.execute(table.insert(), inserts)
+    etags.bump_on_commit(db, "products")
+    db.commit()
+    _count(report, latest, existing, len(inserts))
+
+def _run(db: Session, stream, schema, write, chunk_size: int, defaults: dict, report: ImportReport):
+    try:
+        for chunk in _chunks(_parse(stream, schema, report, defaults), chunk_size):
+            write(db, chunk, report)
+    except ValueError as e:
+        db.rollback()
+        committed = report.inserted + report.updated
+        raise ValueError(f"{e} ({committed} earlier rows were already imported)" if committed else str(e))
+    return report.as_dict()
+
+def import_vendors(db: Session, stream, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """Upserts vendors from a CSV with name, contact_email and phone columns."""
+    return _run(db, stream, schemas.VendorCreate, _write_vendors, chunk_size, {}, ImportReport())
+
+def import_products(db: Session, stream, chunk_size: int = IMPORT_CHUNK_SIZE, vendor_id: Optional[int] = None):
+    """
+    Upserts products from a CSV with name, price and optionally description,
+    quantity, vendor_id and reorder_threshold columns. `vendor_id` applies
+    to rows that do not give their own.
+    """
+    defaults = {} if vendor_id is None else {"vendor_id": vendor_id}
+    report = ImportReport()
+    try:
+        return _run(db, stream, schemas.ProductCreate, _write_products, chunk_size, defaults, report)
+    finally:
+        if report.inserted:
+            # Opening snapshots for the new products, in one statement rather than per chunk
+            snapshots.take(db, missing_only=True)
+        if report.inserted or report.updated:
+            # One event for the whole file rather than one per row
+            events.publish_on_commit(db, "resync", {"reason": "import"})
+            db.commit()
@@ -1,18 +1,107 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+# --- Engine profile ---
+# Every setting can be overridden per deployment through the environment.
+
 # SQLite database URL
-SQLALCHEMY_DATABASE_URL = "sqlite:///./inventory.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("INVENTORY_DATABASE_URL", "sqlite:///./inventory.db")
+
+# WAL lets readers proceed while a writer holds the lock
+SQLITE_JOURNAL_MODE = os.getenv("INVENTORY_SQLITE_JOURNAL_MODE", "WAL")
+# How long a connection waits for a lock before raising "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("INVENTORY_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# NORMAL is durable across application crashes in WAL mode and skips most fsyncs
+SQLITE_SYNCHRONOUS = os.getenv("INVENTORY_SQLITE_SYNCHRONOUS", "NORMAL")
+# Negative values are KiB, positive values are pages
+SQLITE_CACHE_SIZE = int(os.getenv("INVENTORY_SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("INVENTORY_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Sized to Starlette's default thread pool (40 threads), which runs the sync endpoints
+DB_POOL_SIZE = int(os.getenv("INVENTORY_DB_POOL_SIZE", "40"))
+DB_MAX_OVERFLOW = int(os.getenv("INVENTORY_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("INVENTORY_DB_POOL_TIMEOUT", "30"))
+
+# SQLite file that archive.py moves old transactions to, attached to every
+# connection as "archive"; unset disables archiving
+ARCHIVE_PATH = os.getenv("INVENTORY_ARCHIVE_PATH")
+
+# When enabled, read-only endpoints use a separate engine opened with mode=ro
+DB_SEPARATE_READ_ENGINE = os.getenv("INVENTORY_DB_SEPARATE_READ_ENGINE", "0").lower() in ("1", "true", "yes")
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _read_only_url(url: str) -> str:
+    # sqlite:///./inventory.db -> sqlite:///file:./inventory.db?mode=ro&uri=true
+    path = url.split(":///", 1)[1]
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    if ARCHIVE_PATH:
+        cursor.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))
+        cursor.execute(f"PRAGMA archive.journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA archive.synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+def _configure_sqlite_read_only(dbapi_connection, connection_record):
+    # journal_mode is a property of the database file and cannot be set read-only
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    if ARCHIVE_PATH:
+        # The connection was opened with uri=true, so the archive can be read-only too
+        cursor.execute("ATTACH DATABASE ? AS archive", (f"file:{ARCHIVE_PATH}?mode=ro",))
+    cursor.close()
+
+def _create_engine(url: str, on_connect=None):
+    kwargs = {}
+    if _is_sqlite(url):
+        # check_same_thread=False is required for SQLite in multi-threaded environments like FastAPI
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if ":memory:" not in url:
+            kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    new_engine = create_engine(url, **kwargs)
+    if on_connect is not None and _is_sqlite(url):
+        event.listen(new_engine, "connect", on_connect)
+    return new_engine
 
 # Create the database engine
-# check_same_thread=False is required for SQLite in multi-threaded environments like FastAPI
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+engine = _create_engine(SQLALCHEMY_DATABASE_URL, _configure_sqlite)
+
+if DB_SEPARATE_READ_ENGINE and _is_sqlite(SQLALCHEMY_DATABASE_URL):
+    read_engine = _create_engine(_read_only_url(SQLALCHEMY_DATABASE_URL), _configure_sqlite_read_only)
+else:
+    read_engine = engine
+
+# --- Async engine ---
+# Same database through aiosqlite, for the routes in routers/async_api.py
+ASYNC_DATABASE_URL = os.getenv(
+    "INVENTORY_ASYNC_DATABASE_URL",
+    SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1),
 )
+_async_kwargs = {}
+if _is_sqlite(ASYNC_DATABASE_URL) and ":memory:" not in ASYNC_DATABASE_URL:
+    _async_kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_async_kwargs)
+if _is_sqlite(ASYNC_DATABASE_URL):
+    event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
 
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+# expire_on_commit=False: an expired attribute cannot be lazily reloaded from async code
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for our models
 Base = declarative_base()
@@ -24,3 +113,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency for endpoints that only read; uses the read-only engine when configured
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
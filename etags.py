@@ -0,0 +1,67 @@
+"""
+Per-table version counters and ETag support for polled GET endpoints.
+
+Write paths call bump_on_commit(db, "products", ...); the counters move
+only after the session commits. A GET endpoint declared with
+dependencies=[etags.etag("products")] derives its ETag from those
+counters before touching the database, and answers a matching
+If-None-Match with 304.
+
+Counters live in this process. With several worker processes, a write
+handled by one worker is invisible to the others, so set
+INVENTORY_ETAGS=0 unless the API runs as a single process.
+"""
+import os
+import threading
+import uuid
+import zlib
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+import oncommit
+
+ETAGS_ENABLED = os.getenv("INVENTORY_ETAGS", "1").lower() in ("1", "true", "yes")
+
+TABLES = ("vendors", "products", "transactions")
+
+# Distinguishes this process's counters from a previous run's
+_boot_id = uuid.uuid4().hex[:8]
+_versions = dict.fromkeys(TABLES, 0)
+_lock = threading.Lock()
+
+def version(table: str) -> int:
+    return _versions[table]
+
+def bump(*tables: str):
+    with _lock:
+        for table in tables:
+            _versions[table] += 1
+
+def bump_all():
+    bump(*TABLES)
+
+def bump_on_commit(db: Session, *tables: str):
+    """Marks tables as changed once the session's transaction commits."""
+    oncommit.defer(db, _bump_changed_tables, tables)
+
+def _bump_changed_tables(batches):
+    bump(*set().union(*batches))
+
+def make_etag(request: Request, tables) -> str:
+    # The query string selects a different body, so it is part of the tag
+    query = zlib.crc32(str(sorted(request.query_params.multi_items())).encode())
+    counters = ".".join(str(_versions[t]) for t in tables)
+    return f'W/"{_boot_id}-{counters}-{query:08x}"'
+
+def etag(*tables: str):
+    """Route dependency adding an ETag header and short-circuiting If-None-Match with 304."""
+    def check(request: Request, response: Response):
+        if not ETAGS_ENABLED:
+            return
+        tag = make_etag(request, tables)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = [t.strip() for t in if_none_match.split(",")]
+            if "*" in candidates or tag in candidates:
+                raise HTTPException(status_code=304, headers={"ETag": tag})
+        response.headers["ETag"] = tag
+    return Depends(check)
@@ -0,0 +1,191 @@
+"""
+Stock change events, pushed to clients as Server-Sent Events on
+GET /events/stream.
+
+Write paths call publish_on_commit(db, type, data); the event is only
+published once the session commits, and dropped on rollback, like the
+cache invalidations and ETag bumps. Event types:
+
+    quantity_changed     a product's quantity moved (data has the new quantity)
+    low_stock_changed    a product crossed its reorder threshold, either way
+    transaction_created  a transaction was recorded
+    product_created      a product was added
+    product_deleted      a product was removed
+    resync               a bulk change (restore, import, repair) or a gap in
+                         this client's stream; refetch the lists
+
+Payloads carry absolute values, so applying an event twice is harmless.
+
+Every event gets an id of the form "<boot id>-<sequence>". The last
+EVENT_HISTORY events are kept, so a client reconnecting with
+Last-Event-ID receives what it missed; if the id is older than that, or
+from before a restart, it gets a resync instead.
+
+Each subscriber has a buffer of EVENT_BUFFER_SIZE events. A client that
+falls that far behind has its buffer dropped and receives a resync, so a
+slow reader never holds memory for more than its buffer or slows down
+publishers.
+
+Events live in this process. With several worker processes a client only
+sees the writes handled by the worker it is connected to, so run the API
+as a single process to rely on the stream.
+"""
+import asyncio
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Iterable, List, Optional
+from sqlalchemy.orm import Session
+import fastjson, metrics, oncommit
+
+EVENTS_ENABLED = os.getenv("INVENTORY_EVENTS", "1").lower() in ("1", "true", "yes")
+# Events kept for clients resuming with Last-Event-ID
+EVENT_HISTORY = int(os.getenv("INVENTORY_EVENT_HISTORY", "1000"))
+# Events buffered per client before it is told to resync
+EVENT_BUFFER_SIZE = int(os.getenv("INVENTORY_EVENT_BUFFER_SIZE", "256"))
+MAX_SUBSCRIBERS = int(os.getenv("INVENTORY_EVENT_MAX_SUBSCRIBERS", "1000"))
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = float(os.getenv("INVENTORY_EVENT_KEEPALIVE_SECONDS", "15"))
+
+EVENT_TYPES = (
+    "quantity_changed",
+    "low_stock_changed",
+    "transaction_created",
+    "product_created",
+    "product_deleted",
+    "resync",
+)
+
+published_events = metrics.register(metrics.Counter(
+    "inventory_events_published_total", "Stock change events published, by type.", ("type",)))
+overflowed_subscribers = metrics.register(metrics.Counter(
+    "inventory_events_overflows_total", "Times a slow subscriber's buffer was dropped and it was told to resync."))
+
+class Event:
+    __slots__ = ("id", "type", "product_id", "vendor_id", "frame")
+
+    def __init__(self, event_id: str, type: str, data: dict):
+        self.id = event_id
+        self.type = type
+        self.product_id = data.get("product_id")
+        self.vendor_id = data.get("vendor_id")
+        # Encoded once here rather than once per subscriber
+        self.frame = b"id: %s\nevent: %s\ndata: %s\n\n" % (event_id.encode(), type.encode(), fastjson.dumps(data))
+
+def resync_frame(reason: str) -> bytes:
+    # No id line, so the client's Last-Event-ID stays at the last real event
+    return b"event: resync\ndata: %s\n\n" % fastjson.dumps({"reason": reason})
+
+class Subscriber:
+    """One client's filters and bounded buffer. Only touched from its event loop, apart from matches()."""
+
+    def __init__(self, loop, types=None, product_ids=None, vendor_ids=None, buffer_size: int = EVENT_BUFFER_SIZE):
+        self.loop = loop
+        self.types = set(types) if types else None
+        self.product_ids = set(product_ids) if product_ids else None
+        self.vendor_ids = set(vendor_ids) if vendor_ids else None
+        self.buffer_size = buffer_size
+        self.buffer = deque()
+        self.ready = asyncio.Event()
+
+    def matches(self, ev: Event) -> bool:
+        if ev.type == "resync":
+            return True
+        if self.types is not None and ev.type not in self.types:
+            return False
+        if self.product_ids is not None and ev.product_id not in self.product_ids:
+            return False
+        if self.vendor_ids is not None and ev.vendor_id not in self.vendor_ids:
+            return False
+        return True
+
+    def push(self, frame: bytes):
+        if len(self.buffer) >= self.buffer_size:
+            self.buffer.clear()
+            self.buffer.append(resync_frame("overflow"))
+            overflowed_subscribers.inc()
+        self.buffer.append(frame)
+        self.ready.set()
+
+    async def next_frames(self, timeout: float) -> List[bytes]:
+        """Waits up to `timeout` seconds for buffered frames and takes them all (empty on timeout)."""
+        if not self.buffer:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        frames = list(self.buffer)
+        self.buffer.clear()
+        return frames
+
+class Broker:
+    def __init__(self, history: int = EVENT_HISTORY):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, items: Iterable[tuple]):
+        """Assigns ids to (type, data) pairs and hands them to matching subscribers. Safe from any thread."""
+        with self._lock:
+            for type, data in items:
+                self._sequence += 1
+                ev = Event(f"{self.boot_id}-{self._sequence}", type, data)
+                self._history.append((self._sequence, ev))
+                published_events.inc(type=type)
+                for sub in list(self._subscribers):
+                    if sub.matches(ev):
+                        try:
+                            sub.loop.call_soon_threadsafe(sub.push, ev.frame)
+                        except RuntimeError:
+                            # its event loop is closed; the client is gone
+                            self._subscribers.discard(sub)
+
+    def subscribe(self, sub: Subscriber, last_event_id: Optional[str] = None) -> List[bytes]:
+        """
+        Registers a subscriber and returns the frames it missed since
+        last_event_id. Both happen under the publish lock, so nothing is
+        lost or repeated between the replay and the live events.
+        """
+        with self._lock:
+            if len(self._subscribers) >= MAX_SUBSCRIBERS:
+                raise OverflowError("Too many event stream subscribers")
+            self._subscribers.add(sub)
+            if not last_event_id:
+                return []
+            boot_id, _, sequence = last_event_id.partition("-")
+            if boot_id != self.boot_id or not sequence.isdigit() or int(sequence) > self._sequence:
+                return [resync_frame("unknown_event_id")]
+            sequence = int(sequence)
+            oldest = self._history[0][0] if self._history else self._sequence + 1
+            if sequence < oldest - 1:
+                return [resync_frame("history_exceeded")]
+            return [ev.frame for seq, ev in self._history if seq > sequence and sub.matches(ev)]
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+broker = Broker()
+
+@metrics.register_callback
+def _subscriber_metrics():
+    return [
+        "# HELP inventory_events_subscribers Connected event stream clients.",
+        "# TYPE inventory_events_subscribers gauge",
+        f"inventory_events_subscribers {broker.subscriber_count()}",
+    ]
+
+def publish_on_commit(db: Session, type: str, data: dict):
+    """Queues an event to be published once the session's transaction commits."""
+    if EVENTS_ENABLED:
+        oncommit.defer(db, _publish_pending, (type, data))
+
+def _publish_pending(items):
+    broker.publish(items)
@@ -0,0 +1,54 @@
+"""
+Fast serialization for large list responses.
+
+With INVENTORY_FAST_JSON=1, list endpoints select plain column tuples
+instead of ORM objects, skip response_model validation and encode the
+rows directly. The JSON has the same keys and values as the
+response_model version. dumps() uses orjson when it is installed and
+falls back to the stdlib json module otherwise.
+"""
+import json
+import os
+from typing import List, Optional
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+ENABLED = os.getenv("INVENTORY_FAST_JSON", "0").lower() in ("1", "true", "yes")
+
+# helper to handle datetime objects for the stdlib fallback
+def _default(o):
+    if hasattr(o, 'isoformat'):
+        return o.isoformat()
+    return str(o)
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def list_columns(model, schema) -> Optional[List]:
+    """
+    The model columns backing each field of a response schema, in schema
+    order, for crud list functions' `columns` argument. None (load ORM
+    objects) while the fast path is disabled.
+    """
+    if not ENABLED:
+        return None
+    return [getattr(model, name) for name in schema.model_fields]
+
+def rows_response(rows, response: Response) -> FastJSONResponse:
+    """
+    Encodes column-tuple rows as a JSON list of objects, carrying over
+    headers (ETag, X-Next-Cursor) already set on the injected response.
+    """
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return FastJSONResponse([row._asdict() for row in rows], headers=headers)
@@ -1,42 +1,91 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from time import sleep
 
 # --- Configuration ---
 API_URL = "http://127.0.0.1:8000"
+# Seconds a GET response is reused across reruns; writes clear it immediately
+CACHE_TTL = 30
 
 st.set_page_config(page_title="Inventory Management System", layout="wide")
 st.title("📦 Inventory Management System")
 
+# --- HTTP Client ---
+@st.cache_resource
+def get_session():
+    # One pooled, keep-alive session shared by every rerun and user
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_json(path, params=None):
+    response = get_session().get(f"{API_URL}{path}", params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+def invalidate_cache():
+    fetch_json.clear()
+
+def flash(message):
+    # Shown once at the top of the next rerun
+    st.session_state["flash"] = message
+
+def fetch_concurrently(*helpers):
+    """Runs independent helper functions in parallel and returns their results in order."""
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=len(helpers), initializer=lambda: add_script_run_ctx(ctx=ctx)) as pool:
+        return [f.result() for f in [pool.submit(helper) for helper in helpers]]
+
 # --- Helper Functions ---
 def get_vendors():
     try:
-        response = requests.get(f"{API_URL}/vendors/")
-        if response.status_code == 200:
-            return response.json()
+        return fetch_json("/vendors/")
     except requests.exceptions.ConnectionError:
         st.error("Could not connect to backend. Is the FastAPI server running?")
+    except requests.exceptions.RequestException:
+        pass
     return []
 
 def get_products():
     try:
-        response = requests.get(f"{API_URL}/products/")
-        if response.status_code == 200:
-            return response.json()
+        return fetch_json("/products/")
     except requests.exceptions.ConnectionError:
         st.error("Could not connect to backend. Is the FastAPI server running?")
+    except requests.exceptions.RequestException:
+        pass
     return []
 
+def get_transactions():
+    try:
+        return fetch_json("/transactions/")
+    except requests.exceptions.RequestException:
+        return None
+
+def get_summary():
+    try:
+        return fetch_json("/reports/summary")
+    except requests.exceptions.ConnectionError:
+        st.error("Could not connect to backend. Is the FastAPI server running?")
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
 def get_low_stock(threshold=10):
     try:
-        response = requests.get(f"{API_URL}/reports/low-stock", params={"threshold": threshold})
-        if response.status_code == 200:
-            return response.json()
-    except:
+        return fetch_json("/reports/low-stock", {"threshold": threshold})
+    except requests.exceptions.RequestException:
         return []
 
+if "flash" in st.session_state:
+    st.success(st.session_state.pop("flash"))
+
 # --- Sidebar Navigation ---
 st.sidebar.header("Navigation")
 page = st.sidebar.radio("Go to", ["Dashboard", "Vendors", "Products", "Transactions", "Reports"])
@@ -45,20 +94,31 @@ page = st.sidebar.radio("Go to", ["Dashboard", "Vendors", "Products", "Transacti
 if page == "Dashboard":
     st.header("Dashboard")
     
-    vendors = get_vendors()
-    products = get_products()
+    summary = get_summary()
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.metric("Total Vendors", len(vendors))
-    
-    with col2:
-        st.metric("Total Products", len(products))
+    if summary:
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Total Vendors", summary['vendor_count'])
+        
+        with col2:
+            st.metric("Total Products", summary['product_count'])
+            
+        with col3:
+            low_stock_count = summary['low_stock_count']
+            st.metric("Low Stock Items", low_stock_count, delta_color="inverse" if low_stock_count > 0 else "normal")
+        
+        col4, col5, col6 = st.columns(3)
         
-    with col3:
-        low_stock_count = len(get_low_stock())
-        st.metric("Low Stock Items", low_stock_count, delta_color="inverse" if low_stock_count > 0 else "normal")
+        with col4:
+            st.metric("Inventory Value", f"{summary['total_inventory_value']:,.2f}")
+        
+        with col5:
+            st.metric(f"Transactions (last {summary['window_hours']}h)", summary['recent_transaction_count'])
+        
+        with col6:
+            st.metric(f"Units Moved (last {summary['window_hours']}h)", summary['recent_quantity_moved'])
 
 # --- Vendors ---
 elif page == "Vendors":
@@ -77,10 +137,10 @@ elif page == "Vendors":
             vendor_to_delete = st.selectbox("Select Vendor to Delete", vendors, format_func=lambda x: f"{x['name']} (ID: {x['id']})")
             if st.button("Delete Vendor"):
                 try:
-                    res = requests.delete(f"{API_URL}/vendors/{vendor_to_delete['id']}")
+                    res = get_session().delete(f"{API_URL}/vendors/{vendor_to_delete['id']}")
                     if res.status_code == 200:
-                        st.success("Vendor deleted successfully!")
-                        sleep(1)
+                        invalidate_cache()
+                        flash("Vendor deleted successfully!")
                         st.rerun()
                     else:
                         st.error("Failed to delete vendor.")
@@ -99,10 +159,10 @@ elif page == "Vendors":
             if submit:
                 if name:
                     payload = {"name": name, "contact_email": email, "phone": phone}
-                    res = requests.post(f"{API_URL}/vendors/", json=payload)
+                    res = get_session().post(f"{API_URL}/vendors/", json=payload)
                     if res.status_code == 200:
-                        st.success(f"Vendor '{name}' added!")
-                        sleep(1)
+                        invalidate_cache()
+                        flash(f"Vendor '{name}' added!")
                         st.rerun()
                     else:
                         st.error("Failed to add vendor.")
@@ -113,12 +173,11 @@ elif page == "Vendors":
 elif page == "Products":
     st.header("Product Management")
     
-    vendors = get_vendors()
+    vendors, products = fetch_concurrently(get_vendors, get_products)
     
     tab1, tab2 = st.tabs(["List Products", "Add Product"])
     
     with tab1:
-        products = get_products()
         if products:
 
             vendor_map = {v['id']: v['name'] for v in vendors}
@@ -137,10 +196,10 @@ elif page == "Products":
             products_to_delete = st.selectbox("Select Product to Delete", products, format_func=lambda x: f"{x['name']} (ID: {x['id']})")
             if st.button("Delete Product"):
                 try:
-                    res = requests.delete(f"{API_URL}/products/{products_to_delete['id']}")
+                    res = get_session().delete(f"{API_URL}/products/{products_to_delete['id']}")
                     if res.status_code == 200:
-                        st.success("Product deleted successfully!")
-                        sleep(1)
+                        invalidate_cache()
+                        flash("Product deleted successfully!")
                         st.rerun()
                     else:
                         st.error("Failed to delete product.")
@@ -168,10 +227,10 @@ elif page == "Products":
                         "quantity": quantity,
                         "vendor_id": vendor_sel['id']
                     }
-                    res = requests.post(f"{API_URL}/products/", json=payload)
+                    res = get_session().post(f"{API_URL}/products/", json=payload)
                     if res.status_code == 200:
-                        st.success(f"Product '{name}' added!")
-                        sleep(1)
+                        invalidate_cache()
+                        flash(f"Product '{name}' added!")
                         st.rerun()
                     else:
                         st.error("Failed to add product.")
@@ -182,8 +241,7 @@ elif page == "Products":
 elif page == "Transactions":
     st.header("Process Transaction")
     
-    products = get_products()
-    vendors = get_vendors()
+    products, vendors, trans_data = fetch_concurrently(get_products, get_vendors, get_transactions)
     
     if products and vendors:
         with st.form("transaction_form"):
@@ -208,28 +266,23 @@ elif page == "Transactions":
                             "quantity": quantity
                         }
                         
-                        res = requests.post(f"{API_URL}/transactions/", json=payload)
+                        res = get_session().post(f"{API_URL}/transactions/", json=payload)
                         if res.status_code == 200:
-                            st.success("Transaction recorded successfully!")
-                            st.info(f"New Stock Level: {product_sel['quantity'] + quantity}")
-                            sleep(2)
+                            invalidate_cache()
+                            flash(f"Transaction recorded successfully! New Stock Level: {product_sel['quantity'] + quantity}")
                             st.rerun()
                         else:
                             st.error(f"Transaction failed: {res.text}")
         
         st.divider()
         st.subheader("Transaction History")
-        try:
-            res = requests.get(f"{API_URL}/transactions/")
-            if res.status_code == 200:
-                trans_data = res.json()
-                if trans_data:
-                    df = pd.DataFrame(trans_data)
-                    st.dataframe(df, use_container_width=True)
-                else:
-                    st.info("No transactions yet.")
-        except:
+        if trans_data is None:
             st.error("Could not fetch history.")
+        elif trans_data:
+            df = pd.DataFrame(trans_data)
+            st.dataframe(df, use_container_width=True)
+        else:
+            st.info("No transactions yet.")
 
     else:
         st.warning("Add products and vendors first.")
@@ -253,7 +306,7 @@ elif page == "Reports":
     st.subheader("System Backup")
     if st.button("Download Backup JSON"):
         try:
-            res = requests.get(f"{API_URL}/system/backup")
+            res = get_session().get(f"{API_URL}/system/backup")
             if res.status_code == 200:
                 st.download_button(
                     label="Click to Download",
@@ -0,0 +1,107 @@
+"""
+Optional group commit for single-transaction posts.
+
+With INVENTORY_GROUP_COMMIT=1, POST /transactions/ (and its /async
+counterpart) hands the write to one writer thread instead of committing
+on its own. The writer takes whatever has queued up (waiting up to
+GROUP_COMMIT_WAIT_MS for more when the previous group had several items)
+and applies the items in arrival order inside one BEGIN IMMEDIATE
+transaction, each under its own SAVEPOINT. An item that fails
+(insufficient stock, a bad row) only rolls back its savepoint. One
+COMMIT then covers the whole group, and every caller gets its own
+result or error once it is durable.
+
+SQLite allows one writer at a time, so posts that would otherwise queue
+on the file lock and commit one by one share a commit instead.
+
+Batch sizes and queue wait times are exported on /metrics.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import database, metrics, oncommit
+
+GROUP_COMMIT_ENABLED = os.getenv("INVENTORY_GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+# How long the writer waits for more items after the first one of a group
+GROUP_COMMIT_WAIT_MS = float(os.getenv("INVENTORY_GROUP_COMMIT_WAIT_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("INVENTORY_GROUP_COMMIT_MAX_BATCH", "256"))
+
+batch_size = metrics.register(metrics.Histogram(
+    "inventory_group_commit_batch_size", "Writes committed together per group.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)))
+wait_seconds = metrics.register(metrics.Histogram(
+    "inventory_group_commit_wait_seconds", "Time a write spent queued before its group started."))
+commit_seconds = metrics.register(metrics.Histogram(
+    "inventory_group_commit_seconds", "Time to apply and commit one group."))
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+def submit(fn, *args) -> Future:
+    """
+    Queues fn(db, *args) for the writer thread. fn must not commit. The
+    future resolves to fn's return value (or exception) after the group
+    it ran in has committed; returned ORM objects are detached but loaded.
+    """
+    global _writer
+    future = Future()
+    _queue.put((fn, args, future, time.perf_counter()))
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_run, name="group-commit-writer", daemon=True)
+                _writer.start()
+    return future
+
+def _collect(wait: bool):
+    group = [_queue.get()]
+    deadline = time.perf_counter() + (GROUP_COMMIT_WAIT_MS / 1000 if wait else 0)
+    while len(group) < GROUP_COMMIT_MAX_BATCH:
+        try:
+            # Items already queued are taken even once the deadline has passed
+            group.append(_queue.get(timeout=max(deadline - time.perf_counter(), 0)))
+        except queue.Empty:
+            break
+    return group
+
+def _commit(group):
+    outcomes = []
+    # expire_on_commit=False keeps the results readable once the session is closed
+    db = database.SessionLocal(expire_on_commit=False)
+    try:
+        # The savepoints need a real transaction around them: pysqlite would let the
+        # first SAVEPOINT open one, and its RELEASE would then commit. IMMEDIATE also
+        # takes the write lock before any work is done.
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        for fn, args, future, _ in group:
+            try:
+                with oncommit.discard_on_error(db), db.begin_nested():
+                    outcomes.append((future, fn(db, *args), None))
+            except Exception as e:
+                outcomes.append((future, None, e))
+        db.commit()
+    except Exception as e:
+        # close() below rolls the transaction back
+        outcomes = [(future, None, e) for _, _, future, _ in group]
+    finally:
+        db.close()
+    for future, result, error in outcomes:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+def _run():
+    group = []
+    while True:
+        # Waiting only pays off under concurrency; a lone writer is not delayed
+        group = _collect(wait=len(group) > 1)
+        started = time.perf_counter()
+        batch_size.observe(len(group))
+        for _, _, _, submitted in group:
+            wait_seconds.observe(started - submitted)
+        _commit(group)
+        commit_seconds.observe(time.perf_counter() - started)
@@ -1,16 +1,22 @@
 from fastapi import FastAPI
-from database import engine, Base
-from routers import vendors, products, transactions, reports, backup
+from database import engine
+from routers import vendors, products, transactions, reports, backup, stock, events, async_api
+import migrations, metrics
 
-Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 
 app = FastAPI(title="Inventory Management System")
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(vendors.router)
 app.include_router(products.router)
 app.include_router(transactions.router)
 app.include_router(reports.router)
 app.include_router(backup.router)
+app.include_router(stock.router)
+app.include_router(events.router)
+app.include_router(async_api.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,248 @@
+"""
+Request and SQL metrics, exposed on GET /metrics in the Prometheus text
+format.
+
+MetricsMiddleware times every request by route template. Engine event
+hooks count SQL statements and the time spent in them, both in total and
+for the request that issued them (tracked through a contextvar, which
+follows the request into the thread pool and into aiosqlite's greenlets).
+Statements slower than INVENTORY_SLOW_QUERY_MS are logged to the
+"inventory.sql" logger.
+
+With INVENTORY_QUERY_COUNT_HEADER=1 every response also carries
+X-Query-Count and X-Query-Time-Ms. For streamed responses they cover the
+statements issued before the headers were sent.
+
+Metrics live in this process; with several workers each one reports its
+own.
+"""
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import cache
+
+METRICS_ENABLED = os.getenv("INVENTORY_METRICS", "1").lower() in ("1", "true", "yes")
+# Statements slower than this many milliseconds are logged; 0 disables
+SLOW_QUERY_MS = float(os.getenv("INVENTORY_SLOW_QUERY_MS", "100"))
+QUERY_COUNT_HEADER = os.getenv("INVENTORY_QUERY_COUNT_HEADER", "0").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("inventory.sql")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# --- Collectors ---
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(zip(self.labelnames, key))} {_number(value)}")
+        return lines
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                pairs = list(zip(self.labelnames, key))
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {count}")
+                count = state[len(self.buckets)]
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_labels(pairs)} {_number(state[-1])}")
+                lines.append(f"{self.name}_count{_labels(pairs)} {count}")
+        return lines
+
+_registry: List = []
+_callbacks: List[Callable[[], List[str]]] = []
+
+def register(collector):
+    """Adds a Counter or Histogram to the /metrics output and returns it."""
+    _registry.append(collector)
+    return collector
+
+def register_callback(callback: Callable[[], List[str]]):
+    """Adds a function returning ready-made exposition lines, for values read at scrape time."""
+    _callbacks.append(callback)
+    return callback
+
+def render() -> str:
+    lines = []
+    for collector in _registry:
+        lines.extend(collector.render())
+    for callback in _callbacks:
+        lines.extend(callback())
+    return "\n".join(lines) + "\n"
+
+# --- Metrics ---
+http_requests = register(Counter(
+    "inventory_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_latency = register(Histogram(
+    "inventory_http_request_duration_seconds", "Time to send the full response.", ("method", "route")))
+request_statements = register(Histogram(
+    "inventory_http_request_db_statements", "SQL statements issued per request.", ("method", "route"),
+    buckets=STATEMENT_BUCKETS))
+request_db_seconds = register(Counter(
+    "inventory_http_request_db_seconds_total", "Time spent in SQL statements, by route.", ("method", "route")))
+db_statements = register(Counter(
+    "inventory_db_statements_total", "SQL statements executed, including outside requests."))
+db_seconds = register(Counter(
+    "inventory_db_seconds_total", "Time spent executing SQL statements."))
+db_slow_statements = register(Counter(
+    "inventory_db_slow_statements_total", "SQL statements slower than INVENTORY_SLOW_QUERY_MS."))
+
+@register_callback
+def _cache_metrics():
+    caches = {"product": cache.product_cache, "vendor": cache.vendor_cache}
+    lines = [
+        "# HELP inventory_entity_cache_lookups_total Entity cache lookups by result.",
+        "# TYPE inventory_entity_cache_lookups_total counter",
+    ]
+    for name, entity_cache in caches.items():
+        stats = entity_cache.stats()
+        lines.append(f'inventory_entity_cache_lookups_total{{cache="{name}",result="hit"}} {stats["hits"]}')
+        lines.append(f'inventory_entity_cache_lookups_total{{cache="{name}",result="miss"}} {stats["misses"]}')
+    return lines
+
+# --- SQL instrumentation ---
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("inventory_request_stats", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if METRICS_ENABLED:
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start_times")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    db_statements.inc()
+    db_seconds.inc(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+    if SLOW_QUERY_MS > 0 and elapsed * 1000 >= SLOW_QUERY_MS:
+        db_slow_statements.inc()
+        logger.warning("Slow SQL statement (%.1f ms%s): %s", elapsed * 1000, ", executemany" if executemany else "", statement)
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for a failed statement
+    starts = exception_context.connection.info.get("query_start_times") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+# --- Middleware ---
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL usage per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if QUERY_COUNT_HEADER:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-query-count", str(stats.statements).encode()))
+                    headers.append((b"x-query-time-ms", f"{stats.db_seconds * 1000:.2f}".encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            # Label by route template, not raw path, to keep label sets bounded
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method=method, route=path, status=str(status))
+            http_latency.observe(time.perf_counter() - started, method=method, route=path)
+            request_statements.observe(stats.statements, method=method, route=path)
+            request_db_seconds.inc(stats.db_seconds, method=method, route=path)
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text exposition of request, SQL and cache metrics."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,69 @@
+"""
+Brings an existing inventory.db up to date with the models.
+create_all only creates missing tables, so anything added to a table
+that already exists has to be applied here.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from database import Base
+import models, rollups, snapshots, search, archive, changes
+
+# The current UTC time in the format SQLAlchemy stores DateTime values in
+_NOW = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+# Statements that fill in a column for existing rows right after it is added
+BACKFILLS = {
+    ("products", "is_low_stock"): (
+        "UPDATE products SET is_low_stock = "
+        f"(quantity < COALESCE(reorder_threshold, {models.DEFAULT_REORDER_THRESHOLD}))"
+    ),
+    ("vendors", "created_at"): f"UPDATE vendors SET created_at = {_NOW}",
+    ("vendors", "updated_at"): f"UPDATE vendors SET updated_at = {_NOW}",
+    ("products", "created_at"): f"UPDATE products SET created_at = {_NOW}",
+    ("products", "updated_at"): f"UPDATE products SET updated_at = {_NOW}",
+    ("transactions", "created_at"): f"UPDATE transactions SET created_at = COALESCE(timestamp, {_NOW})",
+    ("transactions", "updated_at"): f"UPDATE transactions SET updated_at = COALESCE(timestamp, {_NOW})",
+}
+
+# Tables derived from other data, populated when they are first created
+DERIVED_TABLES = {
+    "product_daily_movements": rollups.rebuild,
+    "vendor_daily_spend": rollups.rebuild,
+    # Today's quantities become the baseline that reconciliation starts from
+    "stock_snapshots": snapshots.take,
+}
+
+def upgrade(engine):
+    new_tables = set(Base.metadata.tables) - set(inspect(engine).get_table_names())
+    Base.metadata.create_all(bind=engine)
+
+    # Columns declared on models after a table was first created
+    existing_tables = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            present = {c["name"] for c in existing_tables.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                backfill = BACKFILLS.get((table.name, column.name))
+                if backfill:
+                    conn.execute(text(backfill))
+
+    # Indexes declared on models after a table was first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # The FTS5 index, the change sequence and their triggers are not models
+    search.ensure_index(engine)
+    changes.ensure_schema(engine)
+    archive.ensure_schema(engine)
+
+    builders = {DERIVED_TABLES[name] for name in new_tables if name in DERIVED_TABLES}
+    if builders:
+        with Session(engine) as db:
+            for build in builders:
+                build(db)
+            db.commit()
@@ -1,9 +1,20 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
 
-class Vendor(Base):
+# Low-stock level for products that have no reorder_threshold of their own
+DEFAULT_REORDER_THRESHOLD = 10
+
+class ChangeTrackingMixin:
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Set on every write, including crud.py's Core UPDATEs
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Commit-ordered number of the row's last write, set by the triggers in
+    # changes.py; drives /system/backup?since=
+    change_seq = Column(Integer, index=True)
+
+class Vendor(ChangeTrackingMixin, Base):
     __tablename__ = "vendors"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -16,22 +27,32 @@ class Vendor(Base):
     # Relationship to transactions
     transactions = relationship("Transaction", back_populates="vendor")
 
-class Product(Base):
+class Product(ChangeTrackingMixin, Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(String)
     price = Column(Float)
-    quantity = Column(Integer, default=0)
+    quantity = Column(Integer, default=0, index=True)
     vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    reorder_threshold = Column(Integer, nullable=True)
+    # quantity < coalesce(reorder_threshold, DEFAULT_REORDER_THRESHOLD); kept current by every stock write in crud.py
+    is_low_stock = Column(Boolean, default=False)
 
     # Relationship to vendor
     vendor = relationship("Vendor", back_populates="products")
     # Relationship to transactions
     transactions = relationship("Transaction", back_populates="product")
 
-class Transaction(Base):
+    __table_args__ = (
+        # Serves the default low-stock report (flagged rows, ordered by quantity) without a sort
+        Index("ix_products_is_low_stock_quantity", "is_low_stock", "quantity"),
+        # Products left behind by a deleted vendor, which listings and search skip
+        Index("ix_products_without_vendor", "id", sqlite_where=text("vendor_id IS NULL")),
+    )
+
+class Transaction(ChangeTrackingMixin, Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -39,8 +60,67 @@ class Transaction(Base):
     vendor_id = Column(Integer, ForeignKey("vendors.id"))
     quantity = Column(Integer)  # Positive for restock, could be negative for sales if extended
     total_cost = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
     product = relationship("Product", back_populates="transactions")
     vendor = relationship("Vendor", back_populates="transactions")
+
+    __table_args__ = (
+        # Per-SKU and per-vendor history by time range
+        Index("ix_transactions_product_id_timestamp", "product_id", "timestamp"),
+        Index("ix_transactions_vendor_id_timestamp", "vendor_id", "timestamp"),
+    )
+
+class Tombstone(Base):
+    """A deleted vendor or product, kept so incremental backups can carry the delete."""
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, index=True)
+    change_seq = Column(Integer, index=True)
+
+class StockSnapshot(Base):
+    """
+    A product's quantity as of a position in the transactions ledger: the
+    snapshot includes every transaction with id <= ledger_position.
+    """
+    __tablename__ = "stock_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    ledger_position = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Latest snapshot per product
+        Index("ix_stock_snapshots_product_id_id", "product_id", "id"),
+    )
+
+# --- Rollups ---
+# Per-day aggregates of the transactions ledger, maintained by rollups.record
+# as transactions are written and regenerated by rollups.rebuild.
+
+class ProductDailyMovement(Base):
+    __tablename__ = "product_daily_movements"
+
+    product_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    quantity_in = Column(Integer, default=0)
+    quantity_out = Column(Integer, default=0)
+    transaction_count = Column(Integer, default=0)
+    total_cost = Column(Float, default=0.0)
+
+class VendorDailySpend(Base):
+    __tablename__ = "vendor_daily_spend"
+
+    vendor_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    quantity_in = Column(Integer, default=0)
+    quantity_out = Column(Integer, default=0)
+    transaction_count = Column(Integer, default=0)
+    spend = Column(Float, default=0.0)  # total_cost of restocks (positive quantities)
+    total_cost = Column(Float, default=0.0)
@@ -0,0 +1,48 @@
+"""
+Work deferred until a session's transaction commits.
+
+ETag bumps (etags.py), cache invalidations (cache.py) and stock change
+events (events.py) must only happen once the write they describe is
+durable. Each queues an item with defer(db, callback, item); when the
+session's outermost transaction commits, every callback is called once
+with the items queued for it, in order. A rollback drops them all.
+
+SQLAlchemy also fires after_commit / after_rollback when a SAVEPOINT is
+released or rolled back; those are ignored, since nothing is committed
+yet. To drop only what a failed savepoint queued, wrap it in
+discard_on_error(db).
+"""
+from contextlib import contextmanager
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+def defer(db: Session, callback: Callable, item):
+    """Queues `item` for callback(items) after the session's transaction commits."""
+    db.info.setdefault("on_commit", []).append((callback, item))
+
+@contextmanager
+def discard_on_error(db: Session):
+    """Drops the items queued inside the block if it raises, e.g. when its SAVEPOINT is rolled back."""
+    pending = db.info.setdefault("on_commit", [])
+    mark = len(pending)
+    try:
+        yield
+    except BaseException:
+        del pending[mark:]
+        raise
+
+@event.listens_for(Session, "after_commit")
+def _run_pending(session):
+    if session.in_nested_transaction():
+        return
+    batches = {}
+    for callback, item in session.info.pop("on_commit", ()):
+        batches.setdefault(callback, []).append(item)
+    for callback, items in batches.items():
+        callback(items)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    if not session.in_nested_transaction():
+        session.info.pop("on_commit", None)
@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Response
+
+# Response header carrying the cursor for the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(**position) -> str:
+    """
+    Packs the sort key of the last row on a page into an opaque token.
+    Datetimes are stored as ISO strings.
+    """
+    payload = {k: v.isoformat() if isinstance(v, datetime) else v for k, v in position.items()}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *keys: str) -> dict:
+    """
+    Unpacks a token made by encode_cursor. Raises ValueError if it is
+    malformed or does not carry the expected keys.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(payload, dict) or any(k not in payload for k in keys):
+        raise ValueError("Invalid cursor")
+    return payload
+
+def after_id(cursor: str) -> int:
+    """Position of an id-ordered list cursor."""
+    try:
+        return int(decode_cursor(cursor, "id")["id"])
+    except TypeError as e:
+        raise ValueError("Invalid cursor") from e
+
+def after_timestamp_id(cursor: str):
+    """Position of a (timestamp, id)-ordered list cursor."""
+    position = decode_cursor(cursor, "ts", "id")
+    try:
+        return datetime.fromisoformat(position["ts"]), int(position["id"])
+    except TypeError as e:
+        raise ValueError("Invalid cursor") from e
+
+def _parse(cursor: Optional[str], position):
+    if cursor is None:
+        return None
+    try:
+        return position(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cursor_after_id(cursor: Optional[str]) -> Optional[int]:
+    """after_id() of an optional `cursor` query parameter; a malformed one is a 400."""
+    return _parse(cursor, after_id)
+
+def cursor_after_timestamp_id(cursor: Optional[str]):
+    """after_timestamp_id() of an optional `cursor` query parameter; a malformed one is a 400."""
+    return _parse(cursor, after_timestamp_id)
+
+def set_next_id_cursor(response: Response, rows, limit: int):
+    """Sets X-Next-Cursor to the last row of a full page of an id-ordered list."""
+    if len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(id=rows[-1].id)
+
+def set_next_timestamp_id_cursor(response: Response, rows, limit: int):
+    """Sets X-Next-Cursor to the last row of a full page of a (timestamp, id)-ordered list."""
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(ts=last.timestamp, id=last.id)
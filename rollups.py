@@ -0,0 +1,110 @@
+"""
+Per-day rollups of the transactions ledger.
+
+record() folds newly written transactions into the rollup tables inside
+the caller's database transaction; rebuild() regenerates them from the
+ledger. Run `python rollups.py rebuild` after editing the ledger by hand.
+"""
+import sys
+from collections import defaultdict
+from sqlalchemy import case, func, insert as sa_insert
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+import models, archive
+
+def _upsert(db: Session, model, key_columns, rows):
+    if not rows:
+        return
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={
+            name: getattr(model, name) + getattr(stmt.excluded, name)
+            for name in rows[0] if name not in key_columns
+        },
+    )
+    db.execute(stmt, rows)
+
+def record(db: Session, transactions):
+    """
+    Adds transactions (objects with product_id, vendor_id, quantity,
+    total_cost and timestamp) to the daily rollups. Does not commit.
+    """
+    products = defaultdict(lambda: [0, 0, 0, 0.0])
+    vendors = defaultdict(lambda: [0, 0, 0, 0.0, 0.0])
+    for t in transactions:
+        if t.timestamp is None:
+            continue
+        day = t.timestamp.date()
+        quantity = t.quantity or 0
+        cost = t.total_cost or 0.0
+        quantity_in, quantity_out = max(quantity, 0), max(-quantity, 0)
+        if t.product_id is not None:
+            p = products[(t.product_id, day)]
+            p[0] += quantity_in
+            p[1] += quantity_out
+            p[2] += 1
+            p[3] += cost
+        if t.vendor_id is not None:
+            v = vendors[(t.vendor_id, day)]
+            v[0] += quantity_in
+            v[1] += quantity_out
+            v[2] += 1
+            v[3] += cost if quantity > 0 else 0.0
+            v[4] += cost
+
+    _upsert(db, models.ProductDailyMovement, ["product_id", "day"], [
+        {"product_id": product_id, "day": day, "quantity_in": a[0], "quantity_out": a[1],
+         "transaction_count": a[2], "total_cost": a[3]}
+        for (product_id, day), a in products.items()
+    ])
+    _upsert(db, models.VendorDailySpend, ["vendor_id", "day"], [
+        {"vendor_id": vendor_id, "day": day, "quantity_in": a[0], "quantity_out": a[1],
+         "transaction_count": a[2], "spend": a[3], "total_cost": a[4]}
+        for (vendor_id, day), a in vendors.items()
+    ])
+
+def rebuild(db: Session):
+    """
+    Regenerates both rollup tables from the transactions ledger, archived
+    rows included, with two grouped INSERT ... SELECTs. Does not commit.
+    """
+    t = archive.combined(lambda c: []) if archive.attached(db) else models.Transaction
+    day = func.date(t.timestamp)
+    quantity_in = func.sum(case((t.quantity > 0, t.quantity), else_=0))
+    quantity_out = func.sum(case((t.quantity < 0, -t.quantity), else_=0))
+
+    db.query(models.ProductDailyMovement).delete(synchronize_session=False)
+    db.query(models.VendorDailySpend).delete(synchronize_session=False)
+
+    db.execute(sa_insert(models.ProductDailyMovement).from_select(
+        ["product_id", "day", "quantity_in", "quantity_out", "transaction_count", "total_cost"],
+        db.query(t.product_id, day, quantity_in, quantity_out, func.count(), func.coalesce(func.sum(t.total_cost), 0.0))
+        .filter(t.product_id.isnot(None), t.timestamp.isnot(None))
+        .group_by(t.product_id, day)
+        .statement,
+    ))
+    db.execute(sa_insert(models.VendorDailySpend).from_select(
+        ["vendor_id", "day", "quantity_in", "quantity_out", "transaction_count", "spend", "total_cost"],
+        db.query(
+            t.vendor_id, day, quantity_in, quantity_out, func.count(),
+            func.coalesce(func.sum(case((t.quantity > 0, t.total_cost), else_=0.0)), 0.0),
+            func.coalesce(func.sum(t.total_cost), 0.0),
+        )
+        .filter(t.vendor_id.isnot(None), t.timestamp.isnot(None))
+        .group_by(t.vendor_id, day)
+        .statement,
+    ))
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python rollups.py rebuild")
+    import database, migrations
+    migrations.upgrade(database.engine)
+    db = database.SessionLocal()
+    try:
+        rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print("Rollups rebuilt")
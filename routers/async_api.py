@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+import database, schemas, crud, crud_async, pagination, etags, groupcommit
+from crud import InsufficientStockError
+
+# Async mirror of the vendors, products and transactions routers.
+# Handlers run on the event loop and await SQLite through aiosqlite
+# instead of holding a thread pool worker for the whole request.
+router = APIRouter(
+    prefix="/async",
+    tags=["async"],
+)
+
+# --- Vendors ---
+@router.post("/vendors/", response_model=schemas.Vendor)
+async def create_vendor(vendor: schemas.VendorCreate, db: AsyncSession = Depends(database.get_async_db)):
+    return await crud_async.create_vendor(db=db, vendor=vendor)
+
+@router.get("/vendors/", response_model=List[schemas.Vendor], dependencies=[etags.etag("vendors")])
+async def read_vendors(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db)):
+    after_id = pagination.cursor_after_id(cursor)
+    vendors = await crud_async.get_vendors(db, skip=skip, limit=limit, after_id=after_id)
+    pagination.set_next_id_cursor(response, vendors, limit)
+    return vendors
+
+@router.get("/vendors/{vendor_id}", response_model=schemas.Vendor)
+async def read_vendor(vendor_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    db_vendor = await crud_async.get_vendor(db, vendor_id=vendor_id)
+    if db_vendor is None:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    return db_vendor
+
+@router.delete("/vendors/{vendor_id}")
+async def delete_vendor(vendor_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    success = await crud_async.delete_vendor(db, vendor_id=vendor_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    return {"message": "Vendor deleted successfully"}
+
+# --- Products ---
+@router.post("/products/", response_model=schemas.Product)
+async def create_product(product: schemas.ProductCreate, db: AsyncSession = Depends(database.get_async_db)):
+    return await crud_async.create_product(db=db, product=product)
+
+@router.get("/products/", response_model=List[schemas.Product], dependencies=[etags.etag("products")])
+async def read_products(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db)):
+    after_id = pagination.cursor_after_id(cursor)
+    products = await crud_async.get_products(db, skip=skip, limit=limit, after_id=after_id)
+    pagination.set_next_id_cursor(response, products, limit)
+    return products
+
+@router.get("/products/{product_id}", response_model=schemas.Product)
+async def read_product(product_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    db_product = await crud_async.get_product(db, product_id=product_id)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return db_product
+
+@router.delete("/products/{product_id}")
+async def delete_product(product_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    success = await crud_async.delete_product(db, product_id=product_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {"message": "Product deleted successfully"}
+
+# --- Transactions ---
+@router.post("/transactions/", response_model=schemas.Transaction)
+async def create_transaction(transaction: schemas.TransactionCreate, db: AsyncSession = Depends(database.get_async_db)):
+    try:
+        if groupcommit.GROUP_COMMIT_ENABLED:
+            # Awaiting the writer's future holds no thread, so groups can grow past the pool size
+            db_transaction = await asyncio.wrap_future(groupcommit.submit(crud.stage_transaction, transaction))
+        else:
+            db_transaction = await crud_async.create_transaction(db=db, transaction=transaction)
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if db_transaction is None:
+        raise HTTPException(status_code=400, detail="Product not found")
+    return db_transaction
+
+@router.post("/transactions/batch", response_model=List[schemas.TransactionBatchResult])
+async def create_transactions_batch(transactions: List[schemas.TransactionCreate], db: AsyncSession = Depends(database.get_async_db)):
+    created = await crud_async.create_transactions(db=db, transactions=transactions)
+    results = []
+    for i, t in enumerate(created):
+        if t is None:
+            results.append({"index": i, "ok": False, "error": "Product not found"})
+        elif isinstance(t, InsufficientStockError):
+            results.append({"index": i, "ok": False, "error": str(t)})
+        else:
+            results.append({"index": i, "ok": True, "transaction": t})
+    return results
+
+@router.get("/transactions/", response_model=List[schemas.Transaction], dependencies=[etags.etag("transactions")])
+async def read_transactions(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db)):
+    after = pagination.cursor_after_timestamp_id(cursor)
+    transactions = await crud_async.get_transactions(db, skip=skip, limit=limit, after=after)
+    pagination.set_next_timestamp_id_cursor(response, transactions, limit)
+    return transactions
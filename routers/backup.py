@@ -1,91 +1,534 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import DateTime, bindparam, or_
 from sqlalchemy.orm import Session
-import database, models
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
+import database, models, crud, rollups, cache, etags, events, fastjson, migrations, snapshots, archive, changes
+import codecs
 import json
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
 
 router = APIRouter(
     prefix="/system",
     tags=["system"],
 )
 
+# Rows are read from the database this many at a time while streaming a backup
+BACKUP_CHUNK_SIZE = 1000
+
+BACKUP_TABLES = (
+    ("vendors", models.Vendor),
+    ("products", models.Product),
+    ("transactions", models.Transaction),
+)
+
+def _iter_chunks(db: Session, model, chunk_size: int, criterion=None):
+    """
+    Yields lists of plain row dicts, walking the table by primary key so
+    each chunk is an index range scan and no ORM objects are built.
+    """
+    # change_seq numbers are local to this database, so they are not exported
+    columns = [c for c in model.__table__.columns if c.name != "change_seq"]
+    last_id = None
+    while True:
+        query = db.query(*columns).order_by(model.id)
+        if criterion is not None:
+            query = query.filter(criterion)
+        if last_id is not None:
+            query = query.filter(model.id > last_id)
+        rows = query.limit(chunk_size).all()
+        if not rows:
+            break
+        yield [row._asdict() for row in rows]
+        last_id = rows[-1].id
+
+def _backup_tables(since: Optional[int]):
+    """(name, model, filter) per exported table; a delta also carries the tombstones."""
+    if since is None:
+        return [(table, model, None) for table, model in BACKUP_TABLES]
+    tables = [(table, model, model.change_seq > since) for table, model in BACKUP_TABLES]
+    tables.append(("tombstones", models.Tombstone, models.Tombstone.change_seq > since))
+    return tables
+
+def _stream_backup(fmt: str, chunk_size: int, since: Optional[int]):
+    # The request-scoped session may be closed before the body is sent,
+    # so the stream owns its own session for its whole lifetime.
+    db = database.ReadSessionLocal()
+    try:
+        # Read before any row: whatever this export misses commits with a
+        # higher number and is picked up by the next delta (see changes.py)
+        header = {"watermark": changes.current(db), "since": since}
+        if fmt == "ndjson":
+            yield fastjson.dumps(header) + b"\n"
+            for table, model, criterion in _backup_tables(since):
+                for chunk in _iter_chunks(db, model, chunk_size, criterion):
+                    yield b"".join(
+                        fastjson.dumps({"table": table, "row": row}) + b"\n"
+                        for row in chunk
+                    )
+            return
+
+        yield "{" + ", ".join(f'"{key}": {fastjson.dumps(value).decode()}' for key, value in header.items())
+        for table, model, criterion in _backup_tables(since):
+            yield f', "{table}": ['
+            first = True
+            for chunk in _iter_chunks(db, model, chunk_size, criterion):
+                body = ", ".join(fastjson.dumps(row).decode() for row in chunk)
+                yield body if first else ", " + body
+                first = False
+            yield "]"
+        yield "}"
+    finally:
+        db.close()
+
 @router.get("/backup")
-def backup_data(db: Session = Depends(database.get_db)):
-    """
-    Exports all Vendors, Products, and Transactions to a JSON object.
-    """
-    vendors = db.query(models.Vendor).all()
-    products = db.query(models.Product).all()
-    transactions = db.query(models.Transaction).all()
-
-    data = {
-        "vendors": [
-            {k: v for k, v in v.__dict__.items() if not k.startswith('_')}
-            for v in vendors
-        ],
-        "products": [
-            {k: v for k, v in p.__dict__.items() if not k.startswith('_')}
-            for p in products
-        ],
-        "transactions": [
-            {k: v for k, v in t.__dict__.items() if not k.startswith('_')}
-            for t in transactions
-        ]
-    }
-    
-    # helper to handle datetime objects for JSON serialization
-    def default_converter(o):
-        if hasattr(o, 'isoformat'):
-            return o.isoformat()
-        return str(o)
+def backup_data(
+    fmt: str = Query("json", alias="format"),
+    chunk_size: int = BACKUP_CHUNK_SIZE,
+    since: Optional[int] = None,
+):
+    """
+    Exports all Vendors, Products, and Transactions.
+    The export is streamed in chunks so memory stays flat regardless of table size.
+    format=json returns a single {"watermark": ..., "since": ..., "vendors": [...], "products": [...],
+    "transactions": [...]} document, format=ndjson returns a {"watermark": ..., "since": ...} line
+    followed by one {"table": ..., "row": ...} object per line.
+    With since=<watermark of an earlier backup>, only rows created or updated since then are
+    exported, plus "tombstones" for deleted vendors and products; apply it with /system/restore?delta=true.
+    """
+    if fmt not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return StreamingResponse(_stream_backup(fmt, chunk_size, since), media_type=media_type)
+
+# Uploads are read this many bytes at a time while restoring
+RESTORE_READ_SIZE = 64 * 1024
+# Rows are existence-checked and inserted this many at a time per table
+RESTORE_CHUNK_SIZE = 1000
+# Keeps the "id IN (...)" lookup well under SQLite's bound parameter limit
+RESTORE_MAX_CHUNK_SIZE = 10000
+
+def _iter_json_backup(stream):
+    """
+    Yields (table, row) pairs from a {"table": [rows...], ...} document,
+    decoding one row at a time so the upload is never held in memory whole.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, False
+
+    def more():
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        data = stream.read(RESTORE_READ_SIZE)
+        eof = not data
+        buf = buf[pos:] + text.decode(data, final=eof)
+        pos = 0
+        return True
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ""
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Malformed backup: expected '{char}'")
+        pos += 1
+
+    def value():
+        nonlocal pos
+        while True:
+            peek()
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not more():
+                    raise
+                continue
+            # a scalar ending exactly at the buffer edge may continue in the next read
+            if end == len(buf) and more():
+                continue
+            pos = end
+            return obj
+
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        key = value()
+        expect(":")
+        if peek() == "[":
+            pos += 1
+            if peek() == "]":
+                pos += 1
+            else:
+                while True:
+                    yield key, value()
+                    if peek() != ",":
+                        break
+                    pos += 1
+                expect("]")
+        else:
+            value()  # scalars are not table data
+        if peek() != ",":
+            break
+        pos += 1
+    expect("}")
+
+def _iter_ndjson_backup(stream):
+    for line in stream:
+        if line.strip():
+            record = json.loads(line)
+            if "table" in record:  # skips the watermark header
+                yield record["table"], record["row"]
+
+class _Restorer:
+    """
+    Buffers incoming rows per table and writes them in chunks: one query
+    to find which IDs already exist, then one bulk INSERT for the rest.
+    In delta mode existing rows are updated instead of skipped, and
+    tombstones delete rows after the tables have been written.
+    Transactions already moved to the archive are skipped in both modes.
+    """
+
+    def __init__(self, db: Session, chunk_size: int, delta: bool = False):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.delta = delta
+        self.tables = {name: model.__table__ for name, model in BACKUP_TABLES}
+        self.pending = {name: [] for name in self.tables}
+        self.tombstones = []
+        self.archive_attached = archive.attached(db)
+        self.inserted = dict.fromkeys(self.tables, 0)
+        self.updated = dict.fromkeys(self.tables, 0)
+        self.deleted = dict.fromkeys(self.tables, 0)
+        self.skipped = dict.fromkeys(self.tables, 0)
+
+    def add(self, table_name: str, row: dict):
+        if table_name == "tombstones" and self.delta:
+            self.tombstones.append(row)
+            if len(self.tombstones) >= self.chunk_size:
+                self.flush_all()
+            return
+        if table_name not in self.tables:
+            return
+        self.pending[table_name].append(row)
+        if len(self.pending[table_name]) >= self.chunk_size:
+            self.flush(table_name)
+
+    def flush(self, table_name: str):
+        rows = self.pending[table_name]
+        if not rows:
+            return
+        table = self.tables[table_name]
+        ids = [row["id"] for row in rows if row.get("id") is not None]
+        seen = {
+            row_id for (row_id,) in self.db.query(table.c.id).filter(table.c.id.in_(ids))
+        } if ids else set()
+        archived = {
+            row_id for (row_id,) in self.db.query(archive.transactions.c.id).filter(archive.transactions.c.id.in_(ids))
+        } if ids and table_name == "transactions" and self.archive_attached else set()
+
+        new_rows, changed_rows = [], []
+        for row in rows:
+            row_id = row.get("id")
+            if row_id is not None:
+                if row_id in archived:
+                    # Already in the archive and counted in the rollups; transactions do not change
+                    self.skipped[table_name] += 1
+                    continue
+                if row_id in seen:
+                    if self.delta:
+                        changed_rows.append({**self._coerce(table, row), "_id": row_id})
+                    else:
+                        self.skipped[table_name] += 1
+                    continue
+                seen.add(row_id)
+            new_rows.append(self._coerce(table, row))
+
+        if changed_rows:
+            # SET takes every column present in the parameters; "_id" only selects the row
+            self.db.execute(table.update().where(table.c.id == bindparam("_id")), changed_rows)
+            self._invalidate(table_name)
+            self.updated[table_name] += len(changed_rows)
+
+        if new_rows:
+            self.db.execute(table.insert(), new_rows)
+            etags.bump_on_commit(self.db, table_name)
+            if table_name == "transactions":
+                rollups.record(self.db, [SimpleNamespace(**row) for row in new_rows])
+        self.inserted[table_name] += len(new_rows)
+        rows.clear()
 
-    return json.loads(json.dumps(data, default=default_converter))
+    def flush_all(self):
+        for table_name in self.tables:
+            self.flush(table_name)
+        self._apply_tombstones()
+
+    def _apply_tombstones(self):
+        params = defaultdict(list)
+        for tombstone in self.tombstones:
+            if tombstone["table_name"] in self.tables:
+                deleted_at = tombstone["deleted_at"]
+                if isinstance(deleted_at, str):
+                    deleted_at = datetime.fromisoformat(deleted_at)
+                params[tombstone["table_name"]].append({"_row_id": tombstone["row_id"], "_deleted_at": deleted_at})
+        self.tombstones.clear()
+
+        for table_name, rows in params.items():
+            table = self.tables[table_name]
+            # A row written after the delete reuses the id; it is not the deleted row
+            result = self.db.execute(
+                table.delete().where(
+                    table.c.id == bindparam("_row_id"),
+                    or_(table.c.updated_at.is_(None), table.c.updated_at <= bindparam("_deleted_at")),
+                ),
+                rows,
+            )
+            self._invalidate(table_name)
+            self.deleted[table_name] += result.rowcount
+            if table_name == "products" and result.rowcount:
+                # Only the products actually deleted, not those whose id was reused since
+                gone = [row["_row_id"] for row in rows]
+                present = {row_id for (row_id,) in self.db.query(table.c.id).filter(table.c.id.in_(gone))}
+                snapshots.forget(self.db, [row_id for row_id in gone if row_id not in present])
+
+    def _invalidate(self, table_name: str):
+        etags.bump_on_commit(self.db, table_name)
+        entity_cache = {"vendors": cache.vendor_cache, "products": cache.product_cache}.get(table_name)
+        if entity_cache is not None:
+            cache.invalidate_on_commit(self.db, entity_cache)
+
+    def _coerce(self, table, row: dict):
+        values = {}
+        for column in table.columns:
+            value = row.get(column.name)
+            # fix timestamp if it's a string
+            if isinstance(value, str) and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            # backups taken before change tracking have no created_at / updated_at
+            if value is None and column.name in ("created_at", "updated_at"):
+                value = datetime.utcnow()
+            values[column.name] = value
+        # The triggers in changes.py number restored rows in this database
+        values.pop("change_seq", None)
+        return values
 
 @router.post("/restore")
-async def restore_data(file: UploadFile = File(...), db: Session = Depends(database.get_db)):
+def restore_data(
+    file: UploadFile = File(...),
+    fmt: str = Query("json", alias="format"),
+    chunk_size: int = RESTORE_CHUNK_SIZE,
+    delta: bool = False,
+    db: Session = Depends(database.get_db),
+):
     """
-    Restores data from a JSON file. 
-    WARNING: This appends to the existing data, it handles IDs naively. 
-    For a production system, you'd want smarter conflict resolution.
+    Restores data from a backup file produced by /system/backup (format=json or format=ndjson).
+    Rows whose ID already exists are skipped; everything else is bulk inserted in chunks
+    of chunk_size and committed as a single transaction.
+    With delta=true, rows whose ID already exists are updated instead and tombstones are
+    applied, so a full backup followed by each /system/backup?since= export, in order,
+    reproduces the source database.
     """
-    try:
-        content = await file.read()
-        data = json.loads(content)
-        
-        # Restore Vendors
-        for v_data in data.get("vendors", []):
-            existing = db.query(models.Vendor).filter(models.Vendor.id == v_data['id']).first()
-            if not existing:
-                vendor = models.Vendor(**v_data)
-                db.add(vendor)
-        
-        db.flush() # flush to save vendors so products can link
-
-        # Restore Products
-        for p_data in data.get("products", []):
-             existing = db.query(models.Product).filter(models.Product.id == p_data['id']).first()
-             if not existing:
-                 product = models.Product(**p_data)
-                 db.add(product)
-        
-        db.flush()
-
-        # Restore Transactions
-        for t_data in data.get("transactions", []):
-             existing = db.query(models.Transaction).filter(models.Transaction.id == t_data['id']).first()
-             if not existing:
-                 trans = models.Transaction(**t_data)
-                 # fix timestamp if it's a string
-                 from datetime import datetime
-                 if isinstance(trans.timestamp, str):
-                     try:
-                        trans.timestamp = datetime.fromisoformat(trans.timestamp)
-                     except:
-                        pass
-                 db.add(trans)
+    if fmt not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if not 1 <= chunk_size <= RESTORE_MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {RESTORE_MAX_CHUNK_SIZE}")
 
+    started = time.perf_counter()
+    restorer = _Restorer(db, chunk_size, delta)
+    try:
+        rows = _iter_ndjson_backup(file.file) if fmt == "ndjson" else _iter_json_backup(file.file)
+        for table_name, row in rows:
+            restorer.add(table_name, row)
+        restorer.flush_all()
+        if restorer.inserted["products"] or restorer.updated["products"]:
+            crud.refresh_low_stock_flags(db)
+        if restorer.inserted["products"]:
+            # Restored quantities become the reconciliation baseline for the new products
+            snapshots.take(db, missing_only=True)
+        events.publish_on_commit(db, "resync", {"reason": "restore"})
         db.commit()
-        return {"message": "Data restored successfully"}
-
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Restore failed: {str(e)}")
+
+    elapsed = time.perf_counter() - started
+    total = sum(restorer.inserted.values()) + sum(restorer.updated.values()) + sum(restorer.skipped.values())
+    return {
+        "message": "Data restored successfully",
+        "inserted": restorer.inserted,
+        "updated": restorer.updated,
+        "deleted": restorer.deleted,
+        "skipped": restorer.skipped,
+        "rows": total,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+# Pages copied per step of the SQLite online backup; -1 copies the whole
+# database in one step, which is one read transaction and so a consistent
+# snapshot even while writes continue (WAL readers do not block writers)
+SNAPSHOT_PAGES_PER_STEP = int(os.getenv("INVENTORY_SNAPSHOT_PAGES_PER_STEP", "-1"))
+# Snapshot files are streamed and uploads spooled this many bytes at a time
+SNAPSHOT_READ_SIZE = 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+
+def _require_sqlite():
+    if not database._is_sqlite(database.SQLALCHEMY_DATABASE_URL):
+        raise HTTPException(status_code=400, detail="Snapshots are only supported for SQLite databases")
+
+@contextmanager
+def _driver_connection(engine):
+    """The pooled connection's underlying sqlite3.Connection, for its backup() method."""
+    raw = engine.raw_connection()
+    try:
+        yield raw.driver_connection
+    finally:
+        raw.close()
+
+def _stream_file(path: str, compress: bool):
+    try:
+        compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(SNAPSHOT_READ_SIZE)
+                if not block:
+                    break
+                yield compressor.compress(block) if compressor else block
+        if compressor:
+            yield compressor.flush()
+    finally:
+        os.remove(path)
+
+@router.get("/snapshot")
+def snapshot(compress: bool = False):
+    """
+    Consistent copy of the whole SQLite database file, made with SQLite's
+    online backup API and streamed back as-is (or gzip-compressed).
+    Restore it with POST /system/snapshot/restore.
+    """
+    _require_sqlite()
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        dest = sqlite3.connect(path)
+        try:
+            with _driver_connection(database.read_engine) as live:
+                live.backup(dest, pages=SNAPSHOT_PAGES_PER_STEP)
+        finally:
+            dest.close()
+    except Exception:
+        os.remove(path)
+        raise
+
+    filename = f"inventory-{datetime.utcnow():%Y%m%dT%H%M%SZ}.db" + (".gz" if compress else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if not compress:
+        headers["Content-Length"] = str(os.path.getsize(path))
+    media_type = "application/gzip" if compress else "application/vnd.sqlite3"
+    return StreamingResponse(_stream_file(path, compress), media_type=media_type, headers=headers)
+
+def _spool_upload(upload: UploadFile, path: str) -> int:
+    """Writes the upload to `path`, gunzipping it when it starts with the gzip magic bytes."""
+    head = upload.file.read(len(GZIP_MAGIC))
+    decompressor = zlib.decompressobj(wbits=31) if head == GZIP_MAGIC else None
+    size = 0
+    with open(path, "wb") as out:
+        block = head
+        while block:
+            data = decompressor.decompress(block) if decompressor else block
+            out.write(data)
+            size += len(data)
+            block = upload.file.read(SNAPSHOT_READ_SIZE)
+        if decompressor:
+            data = decompressor.flush()
+            out.write(data)
+            size += len(data)
+    return size
+
+def _check_snapshot(snap: sqlite3.Connection):
+    result = snap.execute("PRAGMA integrity_check").fetchone()[0]
+    if result != "ok":
+        raise ValueError(f"integrity check failed: {result}")
+    tables = {row[0] for row in snap.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    missing = [name for name, _ in BACKUP_TABLES if name not in tables]
+    if missing:
+        raise ValueError(f"missing tables: {', '.join(missing)}")
+
+@router.post("/snapshot/restore")
+def restore_snapshot(file: UploadFile = File(...)):
+    """
+    Replaces the live database with a file from GET /system/snapshot
+    (plain or gzip-compressed). The upload is spooled to disk and must pass
+    PRAGMA integrity_check before anything is touched; it is then copied
+    over the live database with the online backup API, so other
+    connections see either the old data or the new, never a mix.
+    """
+    _require_sqlite()
+    started = time.perf_counter()
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        try:
+            size = _spool_upload(file, path)
+            snap = sqlite3.connect(path)
+        except (OSError, zlib.error) as e:
+            raise HTTPException(status_code=400, detail=f"Restore failed: {str(e)}")
+        try:
+            try:
+                _check_snapshot(snap)
+            except (sqlite3.DatabaseError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"Not a valid snapshot: {str(e)}")
+            with _driver_connection(database.engine) as live:
+                snap.backup(live, pages=SNAPSHOT_PAGES_PER_STEP)
+        finally:
+            snap.close()
+    finally:
+        os.remove(path)
+
+    # Pooled connections and every in-process cache describe the old file
+    database.engine.dispose()
+    if database.read_engine is not database.engine:
+        database.read_engine.dispose()
+    migrations.upgrade(database.engine)
+    cache.product_cache.clear()
+    cache.vendor_cache.clear()
+    etags.bump_all()
+    events.broker.publish([("resync", {"reason": "restore"})])
+
+    elapsed = time.perf_counter() - started
+    return {
+        "message": "Snapshot restored successfully",
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+    }
+
+@router.get("/cache")
+def cache_stats():
+    """
+    Hit/miss counters and sizes of the in-process Product and Vendor caches.
+    """
+    return {
+        "products": cache.product_cache.stats(),
+        "vendors": cache.vendor_cache.stats(),
+    }
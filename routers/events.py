@@ -0,0 +1,59 @@
+import asyncio
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import events
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+)
+
+# Tells EventSource clients how long to wait before reconnecting
+RETRY_MS = 3000
+
+async def _stream(sub: events.Subscriber, replay: List[bytes]):
+    try:
+        yield b"retry: %d\n\n" % RETRY_MS
+        for frame in replay:
+            yield frame
+        while True:
+            frames = await sub.next_frames(events.KEEPALIVE_SECONDS)
+            if not frames:
+                # A comment line keeps proxies from closing an idle connection
+                yield b": keep-alive\n\n"
+                continue
+            yield b"".join(frames)
+    finally:
+        events.broker.unsubscribe(sub)
+
+@router.get("/stream")
+async def stream_events(
+    types: Optional[str] = None,
+    product_id: Optional[List[int]] = Query(None),
+    vendor_id: Optional[List[int]] = Query(None),
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events stream of stock changes as they are committed: quantity_changed,
+    low_stock_changed, transaction_created, product_created, product_deleted and resync.
+    `types` is a comma-separated list of event types; `product_id` and `vendor_id` may be
+    repeated. Reconnecting with the Last-Event-ID header (or `last_event_id`) replays the
+    events missed in between. A resync event means the client missed events (or a bulk
+    change happened) and should refetch the lists it keeps.
+    """
+    if not events.EVENTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Event stream is disabled")
+    wanted = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    unknown = sorted(set(wanted or ()) - set(events.EVENT_TYPES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event types: {', '.join(unknown)}")
+
+    sub = events.Subscriber(asyncio.get_running_loop(), wanted, product_id, vendor_id)
+    try:
+        replay = events.broker.subscribe(sub, last_event_id_header or last_event_id)
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_stream(sub, replay), media_type="text/event-stream", headers=headers)
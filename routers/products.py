@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile
 from sqlalchemy.orm import Session
-from typing import List
-import database, schemas, crud
+from typing import List, Optional
+from datetime import datetime
+import database, models, schemas, crud, pagination, etags, fastjson, csv_import, search
 
 router = APIRouter(
     prefix="/products",
@@ -12,18 +13,91 @@ router = APIRouter(
 def create_product(product: schemas.ProductCreate, db: Session = Depends(database.get_db)):
     return crud.create_product(db=db, product=product)
 
-@router.get("/", response_model=List[schemas.Product])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    products = crud.get_products(db, skip=skip, limit=limit)
-    return products
+@router.post("/import")
+def import_products(
+    file: UploadFile = File(...),
+    vendor_id: Optional[int] = None,
+    chunk_size: int = csv_import.IMPORT_CHUNK_SIZE,
+    db: Session = Depends(database.get_db),
+):
+    """
+    Creates or updates products from a CSV upload (name, price, and optionally
+    description, quantity, vendor_id, reorder_threshold). Rows are matched to
+    existing products by vendor_id and name; `vendor_id` applies to rows without one.
+    Valid rows are committed every chunk_size rows; invalid rows are listed by line.
+    """
+    if not 1 <= chunk_size <= csv_import.IMPORT_MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {csv_import.IMPORT_MAX_CHUNK_SIZE}")
+    try:
+        return csv_import.import_products(db, file.file, chunk_size=chunk_size, vendor_id=vendor_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/search", response_model=List[schemas.Product], dependencies=[etags.etag("products")])
+def search_products(response: Response, q: str, skip: int = 0, limit: int = 20, db: Session = Depends(database.get_read_db)):
+    """
+    Products whose name or description contain every word of `q`, each matched
+    as a prefix ("blu wid" finds "Blue Widget"), best match first with name
+    matches ranked above description matches. Page with skip and limit.
+    """
+    columns = fastjson.list_columns(models.Product, schemas.Product)
+    try:
+        products = search.search_products(db, q, skip=skip, limit=limit, columns=columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return fastjson.rows_response(products, response) if columns else products
+
+@router.get("/", response_model=List[schemas.Product], dependencies=[etags.etag("products")])
+def read_products(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(database.get_read_db)):
+    """
+    Pass the X-Next-Cursor header of one page as `cursor` to fetch the next.
+    """
+    after_id = pagination.cursor_after_id(cursor)
+    columns = fastjson.list_columns(models.Product, schemas.Product)
+    products = crud.get_products(db, skip=skip, limit=limit, after_id=after_id, columns=columns)
+    pagination.set_next_id_cursor(response, products, limit)
+    return fastjson.rows_response(products, response) if columns else products
 
 @router.get("/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(database.get_db)):
+def read_product(product_id: int, db: Session = Depends(database.get_read_db)):
     db_product = crud.get_product(db, product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     return db_product
 
+@router.put("/{product_id}/reorder-threshold", response_model=schemas.Product)
+def set_reorder_threshold(product_id: int, update: schemas.ReorderThresholdUpdate, db: Session = Depends(database.get_db)):
+    """
+    Sets the quantity below which this product is reported as low stock.
+    Send null to fall back to the default of 10.
+    """
+    db_product = crud.set_reorder_threshold(db, product_id=product_id, reorder_threshold=update.reorder_threshold)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return db_product
+
+@router.get("/{product_id}/transactions", response_model=List[schemas.Transaction])
+def read_product_transactions(
+    product_id: int,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_archive: bool = False,
+    db: Session = Depends(database.get_read_db),
+):
+    """
+    Transaction history of one product in [start, end), oldest first.
+    Pass the X-Next-Cursor header of one page as `cursor` to fetch the next.
+    With include_archive=true, archived transactions are included.
+    """
+    after = pagination.cursor_after_timestamp_id(cursor)
+    columns = fastjson.list_columns(models.Transaction, schemas.Transaction)
+    transactions = crud.get_transactions(db, limit=limit, after=after, product_id=product_id, start=start, end=end, columns=columns, include_archive=include_archive)
+    pagination.set_next_timestamp_id_cursor(response, transactions, limit)
+    return fastjson.rows_response(transactions, response) if columns else transactions
+
 @router.delete("/{product_id}")
 def delete_product(product_id: int, db: Session = Depends(database.get_db)):
     success = crud.delete_product(db, product_id=product_id)
@@ -1,17 +1,196 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
-import database, models, schemas
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+import os
+import database, models, schemas, crud, etags, fastjson
+from cache import TTLCache
+
+# Seconds a computed /reports/summary is reused; 0 disables caching
+SUMMARY_CACHE_TTL = float(os.getenv("INVENTORY_SUMMARY_CACHE_TTL", "5"))
+_summary_cache = TTLCache(ttl=SUMMARY_CACHE_TTL)
 
 router = APIRouter(
     prefix="/reports",
     tags=["reports"],
 )
 
-@router.get("/low-stock", response_model=List[schemas.Product])
-def get_low_stock_products(threshold: int = 10, db: Session = Depends(database.get_db)):
+LOW_STOCK_SORTS = ("quantity", "-quantity", "name", "-name", "id", "-id")
+
+@router.get("/low-stock", response_model=List[schemas.Product], dependencies=[etags.etag("products")])
+def get_low_stock_products(
+    response: Response,
+    threshold: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    sort: str = "quantity",
+    db: Session = Depends(database.get_read_db),
+):
+    """
+    Returns a page of products where the quantity is below the specified threshold.
+    Without a threshold, each product is compared to its own reorder_threshold
+    (default 10). Sort by quantity, name or id; prefix with '-' for descending.
+    """
+    if sort not in LOW_STOCK_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(LOW_STOCK_SORTS)}")
+    columns = fastjson.list_columns(models.Product, schemas.Product)
+    products = crud.get_low_stock_products(db, threshold=threshold, skip=skip, limit=limit, sort=sort, columns=columns)
+    return fastjson.rows_response(products, response) if columns else products
+
+@router.get("/summary", response_model=schemas.InventorySummary)
+def get_summary(threshold: Optional[int] = None, hours: int = 24, db: Session = Depends(database.get_read_db)):
+    """
+    Dashboard figures computed with aggregate queries: vendor and product counts,
+    total inventory value, number of low-stock products (below `threshold`, or below
+    their own reorder threshold when it is not given, as in /reports/low-stock), and
+    transaction volume over the last `hours`. Results are cached for a few seconds.
+    """
+    key = (threshold, hours)
+    summary = _summary_cache.get(key)
+    if summary is not None:
+        return summary
+
+    now = datetime.utcnow()
+    since = now - timedelta(hours=hours)
+
+    vendor_count = db.query(func.count(models.Vendor.id)).scalar()
+    product_count, inventory_value = (
+        db.query(
+            func.count(models.Product.id),
+            func.coalesce(func.sum(models.Product.price * models.Product.quantity), 0.0),
+        )
+        .filter(models.Product.vendor_id.isnot(None))
+        .one()
+    )
+    # Served by ix_products_is_low_stock_quantity / ix_products_quantity
+    low_stock = (
+        models.Product.is_low_stock.is_(True) if threshold is None
+        else models.Product.quantity < threshold
+    )
+    low_stock_count = (
+        db.query(func.count(models.Product.id))
+        .filter(low_stock, models.Product.vendor_id.isnot(None))
+        .scalar()
+    )
+    transaction_count, quantity_moved, transaction_value = (
+        db.query(
+            func.count(models.Transaction.id),
+            func.coalesce(func.sum(func.abs(models.Transaction.quantity)), 0),
+            func.coalesce(func.sum(models.Transaction.total_cost), 0.0),
+        )
+        .filter(models.Transaction.timestamp >= since)
+        .one()
+    )
+
+    summary = schemas.InventorySummary(
+        vendor_count=vendor_count,
+        product_count=product_count,
+        total_inventory_value=inventory_value,
+        low_stock_threshold=threshold,
+        low_stock_count=low_stock_count,
+        window_hours=hours,
+        recent_transaction_count=transaction_count,
+        recent_quantity_moved=quantity_moved,
+        recent_transaction_value=transaction_value,
+        generated_at=now,
+    )
+    _summary_cache.set(key, summary)
+    return summary
+
+# strftime patterns used to group daily rollup rows into report periods
+BUCKETS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+def _bucket(bucket: str):
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    return BUCKETS[bucket]
+
+def _in_range(query, day_column, start: Optional[date], end: Optional[date]):
+    if start is not None:
+        query = query.filter(day_column >= start)
+    if end is not None:
+        query = query.filter(day_column <= end)
+    return query
+
+@router.get("/movements", response_model=List[schemas.MovementBucket])
+def get_movements(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    product_id: Optional[int] = None,
+    bucket: str = "day",
+    db: Session = Depends(database.get_read_db),
+):
+    """
+    Stock movement per day, week or month between start and end (inclusive),
+    for one product or all of them. Reads the daily rollups, not the ledger.
+    """
+    r = models.ProductDailyMovement
+    period = func.strftime(_bucket(bucket), r.day).label("period")
+    query = db.query(
+        period,
+        func.sum(r.quantity_in).label("quantity_in"),
+        func.sum(r.quantity_out).label("quantity_out"),
+        func.sum(r.transaction_count).label("transaction_count"),
+        func.sum(r.total_cost).label("total_cost"),
+    )
+    if product_id is not None:
+        query = query.filter(r.product_id == product_id)
+    rows = _in_range(query, r.day, start, end).group_by(period).order_by(period).all()
+    return [
+        {**row._asdict(), "net_quantity": row.quantity_in - row.quantity_out}
+        for row in rows
+    ]
+
+@router.get("/top-movers", response_model=List[schemas.ProductMovement])
+def get_top_movers(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = 10,
+    db: Session = Depends(database.get_read_db),
+):
+    """
+    Products with the most units moved (in plus out) between start and end.
+    """
+    r = models.ProductDailyMovement
+    moved = func.sum(r.quantity_in + r.quantity_out)
+    query = db.query(
+        r.product_id,
+        func.sum(r.quantity_in).label("quantity_in"),
+        func.sum(r.quantity_out).label("quantity_out"),
+        func.sum(r.transaction_count).label("transaction_count"),
+        func.sum(r.total_cost).label("total_cost"),
+    )
+    rows = _in_range(query, r.day, start, end).group_by(r.product_id).order_by(moved.desc()).limit(limit).all()
+    return [
+        {**row._asdict(), "net_quantity": row.quantity_in - row.quantity_out}
+        for row in rows
+    ]
+
+@router.get("/vendor-spend", response_model=List[schemas.VendorSpendBucket])
+def get_vendor_spend(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    vendor_id: Optional[int] = None,
+    bucket: str = "month",
+    db: Session = Depends(database.get_read_db),
+):
     """
-    Returns a list of products where the quantity is below the specified threshold.
-    Default threshold is 10.
+    Spend (cost of restocks) and net transaction value per vendor per day,
+    week or month between start and end (inclusive). Reads the daily rollups.
     """
-    return db.query(models.Product).filter(models.Product.quantity < threshold).all()
+    r = models.VendorDailySpend
+    period = func.strftime(_bucket(bucket), r.day).label("period")
+    query = db.query(
+        period,
+        r.vendor_id,
+        func.sum(r.quantity_in).label("quantity_in"),
+        func.sum(r.quantity_out).label("quantity_out"),
+        func.sum(r.transaction_count).label("transaction_count"),
+        func.sum(r.spend).label("spend"),
+        func.sum(r.total_cost).label("total_cost"),
+    )
+    if vendor_id is not None:
+        query = query.filter(r.vendor_id == vendor_id)
+    rows = _in_range(query, r.day, start, end).group_by(period, r.vendor_id).order_by(period, r.vendor_id).all()
+    return [row._asdict() for row in rows]
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+import database, schemas, snapshots, archive
+
+router = APIRouter(
+    prefix="/system",
+    tags=["system"],
+)
+
+@router.post("/stock-snapshots", response_model=schemas.SnapshotResult)
+def take_stock_snapshot(db: Session = Depends(database.get_db)):
+    """
+    Records every product's current quantity against the newest transaction id.
+    Reconciliation only reads the ledger after each product's latest snapshot,
+    so taking one periodically keeps it fast.
+    """
+    count = snapshots.take(db)
+    db.commit()
+    return {"products": count}
+
+@router.get("/reconcile", response_model=schemas.ReconciliationReport)
+def reconcile_stock(db: Session = Depends(database.get_read_db)):
+    """
+    Compares each product's quantity with its latest snapshot plus the transactions since,
+    and lists the products where they differ.
+    """
+    return snapshots.reconcile(db)
+
+@router.post("/reconcile", response_model=schemas.ReconciliationReport)
+def repair_stock(db: Session = Depends(database.get_db)):
+    """
+    Like GET /system/reconcile, but also sets each mismatched quantity to the ledger value.
+    Products whose quantity changed during the check, or whose ledger value is negative,
+    are left alone and reported with repaired=false.
+    """
+    return snapshots.reconcile(db, repair=True)
+
+@router.post("/archive", response_model=schemas.ArchiveResult)
+def archive_transactions(older_than_days: Optional[float] = None):
+    """
+    Moves transactions older than `older_than_days` (default INVENTORY_ARCHIVE_AFTER_DAYS)
+    into the archive database, in short batches so other writes keep going.
+    Read them back with include_archive=true on the transaction history endpoints.
+    """
+    if older_than_days is not None and older_than_days < 0:
+        raise HTTPException(status_code=400, detail="older_than_days must not be negative")
+    try:
+        return archive.run(database.engine, older_than_days=archive.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
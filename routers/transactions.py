@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
-import database, schemas, crud
+from typing import List, Optional
+from datetime import datetime
+import database, models, schemas, crud, pagination, etags, fastjson, groupcommit
 
 router = APIRouter(
     prefix="/transactions",
@@ -10,13 +11,53 @@ router = APIRouter(
 
 @router.post("/", response_model=schemas.Transaction)
 def create_transaction(transaction: schemas.TransactionCreate, db: Session = Depends(database.get_db)):
-    db_transaction = crud.create_transaction(db=db, transaction=transaction)
+    try:
+        if groupcommit.GROUP_COMMIT_ENABLED:
+            db_transaction = groupcommit.submit(crud.stage_transaction, transaction).result()
+        else:
+            db_transaction = crud.create_transaction(db=db, transaction=transaction)
+    except crud.InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if db_transaction is None:
         raise HTTPException(status_code=400, detail="Product not found")
     return db_transaction
 
-@router.get("/", response_model=List[schemas.Transaction])
-def read_transactions(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    transactions = crud.get_transactions(db, skip=skip, limit=limit)
-    return transactions
+@router.post("/batch", response_model=List[schemas.TransactionBatchResult])
+def create_transactions_batch(transactions: List[schemas.TransactionCreate], db: Session = Depends(database.get_db)):
+    """
+    Records many transactions in a single database commit.
+    Returns one result per submitted item, in the same order.
+    """
+    created = crud.create_transactions(db=db, transactions=transactions)
+    results = []
+    for i, t in enumerate(created):
+        if t is None:
+            results.append({"index": i, "ok": False, "error": "Product not found"})
+        elif isinstance(t, crud.InsufficientStockError):
+            results.append({"index": i, "ok": False, "error": str(t)})
+        else:
+            results.append({"index": i, "ok": True, "transaction": t})
+    return results
+
+@router.get("/", response_model=List[schemas.Transaction], dependencies=[etags.etag("transactions")])
+def read_transactions(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    include_archive: bool = False,
+    db: Session = Depends(database.get_read_db),
+):
+    """
+    Transactions are ordered by timestamp, then id, optionally limited to [start, end).
+    Pass the X-Next-Cursor header of one page as `cursor` to fetch the next.
+    With include_archive=true, archived transactions are included (see archive.py).
+    """
+    after = pagination.cursor_after_timestamp_id(cursor)
+    columns = fastjson.list_columns(models.Transaction, schemas.Transaction)
+    transactions = crud.get_transactions(db, skip=skip, limit=limit, after=after, start=start, end=end, columns=columns, include_archive=include_archive)
+    pagination.set_next_timestamp_id_cursor(response, transactions, limit)
+    return fastjson.rows_response(transactions, response) if columns else transactions
 
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile
 from sqlalchemy.orm import Session
-from typing import List
-import database, schemas, crud
+from typing import List, Optional
+from datetime import datetime
+import database, models, schemas, crud, pagination, etags, fastjson, csv_import
 
 router = APIRouter(
     prefix="/vendors",
@@ -12,20 +13,66 @@ router = APIRouter(
 def create_vendor(vendor: schemas.VendorCreate, db: Session = Depends(database.get_db)):
     return crud.create_vendor(db=db, vendor=vendor)
 
-@router.get("/", response_model=List[schemas.Vendor])
-def read_vendors(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    users = crud.get_vendors(db, skip=skip, limit=limit)
+@router.post("/import")
+def import_vendors(
+    file: UploadFile = File(...),
+    chunk_size: int = csv_import.IMPORT_CHUNK_SIZE,
+    db: Session = Depends(database.get_db),
+):
+    """
+    Creates or updates vendors from a CSV upload (name, contact_email, phone).
+    Rows are matched to existing vendors by name. Valid rows are committed every
+    chunk_size rows; invalid rows are listed by line.
+    """
+    if not 1 <= chunk_size <= csv_import.IMPORT_MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {csv_import.IMPORT_MAX_CHUNK_SIZE}")
+    try:
+        return csv_import.import_vendors(db, file.file, chunk_size=chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[schemas.Vendor], dependencies=[etags.etag("vendors")])
+def read_vendors(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(database.get_read_db)):
+    """
+    Pass the X-Next-Cursor header of one page as `cursor` to fetch the next.
+    """
+    after_id = pagination.cursor_after_id(cursor)
+    columns = fastjson.list_columns(models.Vendor, schemas.Vendor)
+    users = crud.get_vendors(db, skip=skip, limit=limit, after_id=after_id, columns=columns)
     if users is None:
         raise HTTPException(status_code=404, detail="Vendor not found")
-    return users
+    pagination.set_next_id_cursor(response, users, limit)
+    return fastjson.rows_response(users, response) if columns else users
 
 @router.get("/{vendor_id}", response_model=schemas.Vendor)
-def read_vendor(vendor_id: int, db: Session = Depends(database.get_db)):
+def read_vendor(vendor_id: int, db: Session = Depends(database.get_read_db)):
     db_vendor = crud.get_vendor(db, vendor_id=vendor_id)
     if db_vendor is None:
         raise HTTPException(status_code=404, detail="Vendor not found")
     return db_vendor
 
+@router.get("/{vendor_id}/transactions", response_model=List[schemas.Transaction])
+def read_vendor_transactions(
+    vendor_id: int,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_archive: bool = False,
+    db: Session = Depends(database.get_read_db),
+):
+    """
+    Transaction history of one vendor in [start, end), oldest first.
+    Pass the X-Next-Cursor header of one page as `cursor` to fetch the next.
+    With include_archive=true, archived transactions are included.
+    """
+    after = pagination.cursor_after_timestamp_id(cursor)
+    columns = fastjson.list_columns(models.Transaction, schemas.Transaction)
+    transactions = crud.get_transactions(db, limit=limit, after=after, vendor_id=vendor_id, start=start, end=end, columns=columns, include_archive=include_archive)
+    pagination.set_next_timestamp_id_cursor(response, transactions, limit)
+    return fastjson.rows_response(transactions, response) if columns else transactions
+
 @router.delete("/{vendor_id}")
 def delete_vendor(vendor_id: int, db: Session = Depends(database.get_db)):
     success = crud.delete_vendor(db, vendor_id=vendor_id)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # --- Vendor Schemas ---
@@ -23,12 +23,17 @@ class ProductBase(BaseModel):
     price: float
     quantity: int = 0
     vendor_id: int
+    reorder_threshold: Optional[int] = None
 
 class ProductCreate(ProductBase):
     pass
 
+class ReorderThresholdUpdate(BaseModel):
+    reorder_threshold: Optional[int] = None
+
 class Product(ProductBase):
     id: int
+    is_low_stock: bool = False
     class Config:
         orm_mode = True
 
@@ -48,3 +53,73 @@ class Transaction(TransactionBase):
     
     class Config:
         orm_mode = True
+
+class TransactionBatchResult(BaseModel):
+    index: int
+    ok: bool
+    transaction: Optional[Transaction] = None
+    error: Optional[str] = None
+
+# --- Report Schemas ---
+class InventorySummary(BaseModel):
+    vendor_count: int
+    product_count: int
+    total_inventory_value: float
+    # None when products are compared to their own reorder_threshold
+    low_stock_threshold: Optional[int] = None
+    low_stock_count: int
+    window_hours: int
+    recent_transaction_count: int
+    recent_quantity_moved: int
+    recent_transaction_value: float
+    generated_at: datetime
+
+class MovementBucket(BaseModel):
+    period: str
+    quantity_in: int
+    quantity_out: int
+    net_quantity: int
+    transaction_count: int
+    total_cost: float
+
+class ProductMovement(BaseModel):
+    product_id: int
+    quantity_in: int
+    quantity_out: int
+    net_quantity: int
+    transaction_count: int
+    total_cost: float
+
+class VendorSpendBucket(BaseModel):
+    period: str
+    vendor_id: int
+    quantity_in: int
+    quantity_out: int
+    transaction_count: int
+    spend: float
+    total_cost: float
+
+# --- Stock Reconciliation Schemas ---
+class StockMismatch(BaseModel):
+    product_id: int
+    quantity: int
+    expected_quantity: int
+    difference: int
+    repaired: bool
+
+class ReconciliationReport(BaseModel):
+    products_checked: int
+    ledger_start: int
+    transactions_scanned: int
+    mismatches: List[StockMismatch]
+    repaired: int
+    seconds: float
+
+class SnapshotResult(BaseModel):
+    products: int
+
+class ArchiveResult(BaseModel):
+    cutoff: datetime
+    archived: int
+    batches: int
+    seconds: float
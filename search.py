@@ -0,0 +1,117 @@
+"""
+Full-text product search over an SQLite FTS5 index.
+
+products_fts is an external-content FTS5 table: it indexes products.name
+and products.description but stores no copy of them. Triggers on products
+keep it in step with every write path (crud, CSV import, restore), and
+the update trigger only fires when name or description actually change,
+so stock updates and re-imports of unchanged rows do not touch it. migrations.upgrade() creates the table and
+triggers and builds the index from the existing rows. Run
+`python search.py rebuild` if the index is ever suspected to be out of
+step.
+"""
+import re
+import sys
+from typing import Optional
+from sqlalchemy import column, inspect, literal_column, select, table, text
+from sqlalchemy.orm import Session
+import models
+
+# A match in the name counts this many times more than one in the description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# prefix='2 3' keeps extra indexes for 2 and 3 character prefixes, which
+# are the expensive ones to expand for "ab*" style queries
+INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, description, content='products', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+TRIGGERS_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products "
+    "WHEN old.name IS NOT new.name OR old.description IS NOT new.description BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+)
+
+products_fts = table("products_fts", column("rowid"))
+
+def ensure_index(engine):
+    """Creates products_fts and its triggers if missing, building the index from existing products."""
+    if engine.dialect.name != "sqlite":
+        return
+    created = "products_fts" not in inspect(engine).get_table_names()
+    with engine.begin() as conn:
+        conn.execute(text(INDEX_DDL))
+        for ddl in TRIGGERS_DDL:
+            conn.execute(text(ddl))
+        if created:
+            conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+def rebuild(db: Session):
+    """Rebuilds the whole index from the products table. Does not commit."""
+    db.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+def match_query(q: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 query matching every word as a prefix,
+    e.g. 'blue wid' -> '"blue"* "wid"*'. Quoting each word keeps FTS5
+    operators and punctuation in user input from being interpreted.
+    None if the text has no words.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+def search_products(db: Session, q: str, skip: int = 0, limit: int = 100, columns: Optional[list] = None):
+    """
+    Products matching every word of `q` (as a prefix) in their name or
+    description, best match first by bm25. Raises ValueError if `q` has
+    no words.
+    """
+    match = match_query(q)
+    if match is None:
+        raise ValueError("Search text must contain at least one letter or digit")
+    # Rank and page inside the FTS table, so only the page is joined to products
+    score = literal_column(f"bm25(products_fts, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})").label("score")
+    # Like crud.get_products, skip products whose vendor was deleted. Done before
+    # paging so pages stay full; ix_products_without_vendor keeps the lookup small
+    has_vendor = products_fts.c.rowid.not_in(
+        select(models.Product.id).where(models.Product.vendor_id.is_(None))
+    )
+    ranked = (
+        select(products_fts.c.rowid.label("product_id"), score)
+        .where(text("products_fts MATCH :match"), has_vendor)
+        .order_by(score, products_fts.c.rowid)
+        .offset(skip)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        db.query(*(columns or [models.Product]))
+        .join(ranked, ranked.c.product_id == models.Product.id)
+        .order_by(ranked.c.score, models.Product.id)
+        .params(match=match)
+        .all()
+    )
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python search.py rebuild")
+    import database, migrations
+    migrations.upgrade(database.engine)
+    with database.SessionLocal() as db:
+        rebuild(db)
+        db.commit()
+    print("Search index rebuilt")
@@ -0,0 +1,177 @@
+"""
+Stock snapshots and ledger reconciliation.
+
+A snapshot records each product's quantity together with the id of the
+last transaction it includes. A product's on-hand quantity is then its
+latest snapshot plus the transactions written after it, so reconcile()
+only aggregates the ledger from the oldest of those snapshots forward
+(a primary key range scan) instead of the whole transactions table.
+
+Every product gets an opening snapshot when it is created, so new
+products never force a scan from the start of the ledger. Take a fresh
+snapshot periodically (POST /system/stock-snapshots or
+`python snapshots.py take`) to keep reconciliation cheap.
+
+    python snapshots.py take
+    python snapshots.py reconcile [--repair]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, insert, literal, select
+from sqlalchemy.orm import Session
+import models, cache, etags, events
+
+# Snapshots older than this are pruned when a new one is taken; the latest
+# snapshot of each product is always kept
+SNAPSHOT_RETENTION_DAYS = float(os.getenv("INVENTORY_SNAPSHOT_RETENTION_DAYS", "30"))
+
+def ledger_position():
+    """SQL expression for the id of the newest transaction (0 for an empty ledger)."""
+    return select(func.coalesce(func.max(models.Transaction.id), 0)).scalar_subquery()
+
+def opening_snapshot(product_id: int, quantity: int) -> models.StockSnapshot:
+    """Snapshot for a newly created product, so its starting quantity is part of the baseline."""
+    return models.StockSnapshot(product_id=product_id, quantity=quantity, ledger_position=ledger_position())
+
+def forget(db: Session, product_ids):
+    """
+    Deletes the snapshots of deleted products. SQLite hands a freed id to
+    the next product, which would otherwise inherit the old snapshots and
+    skip its opening one. Does not commit.
+    """
+    s = models.StockSnapshot
+    db.query(s).filter(s.product_id.in_(product_ids)).delete(synchronize_session=False)
+
+def take(db: Session, missing_only: bool = False) -> int:
+    """
+    Snapshots every product (or only those with no snapshot yet) with one
+    INSERT ... SELECT, so quantities and the ledger position are read
+    together. Prunes old snapshots. Does not commit. Returns the number
+    of snapshots written.
+    """
+    p, s = models.Product, models.StockSnapshot
+    query = select(p.id, p.quantity, ledger_position(), literal(datetime.utcnow(), s.taken_at.type))
+    if missing_only:
+        query = query.where(~select(s.id).where(s.product_id == p.id).exists())
+    result = db.execute(
+        insert(s).from_select(["product_id", "quantity", "ledger_position", "taken_at"], query)
+    )
+    if not missing_only and SNAPSHOT_RETENTION_DAYS > 0:
+        latest = select(func.max(s.id)).group_by(s.product_id)
+        cutoff = datetime.utcnow() - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+        db.query(s).filter(s.taken_at < cutoff, s.id.not_in(latest)).delete(synchronize_session=False)
+    return result.rowcount
+
+def _latest_snapshots(db: Session):
+    s = models.StockSnapshot
+    # SQLite returns the bare columns from the row holding MAX(id)
+    return (
+        db.query(s.product_id, func.max(s.id).label("snapshot_id"), s.quantity, s.ledger_position)
+        .group_by(s.product_id)
+        .subquery()
+    )
+
+def reconcile(db: Session, repair: bool = False) -> dict:
+    """
+    Compares every product's quantity with its latest snapshot plus the
+    ledger since, using one grouped aggregate over the transactions after
+    the oldest latest-snapshot. With repair=True, mismatched quantities
+    are set to the ledger value (and committed) unless the product changed
+    in the meantime or the ledger value is negative.
+    """
+    started = time.perf_counter()
+    p, t = models.Product, models.Transaction
+    latest = _latest_snapshots(db)
+
+    has_unsnapshotted = db.query(p.id).outerjoin(latest, latest.c.product_id == p.id).filter(
+        latest.c.product_id.is_(None)
+    ).first() is not None
+    start = 0 if has_unsnapshotted else db.query(func.coalesce(func.min(latest.c.ledger_position), 0)).scalar()
+
+    movement = (
+        db.query(
+            t.product_id,
+            func.sum(t.quantity).label("delta"),
+            func.count(t.id).label("scanned"),
+        )
+        .outerjoin(latest, latest.c.product_id == t.product_id)
+        .filter(t.id > start, t.id > func.coalesce(latest.c.ledger_position, 0), t.product_id.isnot(None))
+        .group_by(t.product_id)
+        .subquery()
+    )
+    expected = func.coalesce(latest.c.quantity, 0) + func.coalesce(movement.c.delta, 0)
+    rows = (
+        db.query(p.id, p.quantity, expected.label("expected"), func.coalesce(movement.c.scanned, 0))
+        .outerjoin(latest, latest.c.product_id == p.id)
+        .outerjoin(movement, movement.c.product_id == p.id)
+        .all()
+    )
+
+    mismatches = []
+    scanned = 0
+    for product_id, quantity, expected_quantity, product_scanned in rows:
+        scanned += product_scanned
+        if quantity != expected_quantity:
+            mismatches.append({
+                "product_id": product_id,
+                "quantity": quantity,
+                "expected_quantity": expected_quantity,
+                "difference": quantity - expected_quantity,
+                "repaired": False,
+            })
+
+    if repair and mismatches:
+        _repair(db, [m for m in mismatches if m["expected_quantity"] >= 0])
+
+    return {
+        "products_checked": len(rows),
+        "ledger_start": start,
+        "transactions_scanned": scanned,
+        "mismatches": mismatches,
+        "repaired": sum(m["repaired"] for m in mismatches),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+def _repair(db: Session, mismatches):
+    table = models.Product.__table__
+    stmt = (
+        table.update()
+        # Only if nothing moved the quantity since it was read
+        .where(table.c.id == bindparam("b_id"), table.c.quantity == bindparam("b_observed"))
+        .values(
+            quantity=bindparam("b_quantity"),
+            # same rule as crud.low_stock_expression, for the new quantity
+            is_low_stock=bindparam("b_quantity") < func.coalesce(table.c.reorder_threshold, models.DEFAULT_REORDER_THRESHOLD),
+        )
+    )
+    for m in mismatches:
+        result = db.execute(stmt, {"b_id": m["product_id"], "b_observed": m["quantity"], "b_quantity": m["expected_quantity"]})
+        m["repaired"] = result.rowcount == 1
+    if any(m["repaired"] for m in mismatches):
+        events.publish_on_commit(db, "resync", {"reason": "reconcile"})
+    cache.invalidate_on_commit(db, cache.product_cache)
+    etags.bump_on_commit(db, "products")
+    db.commit()
+
+if __name__ == "__main__":
+    if sys.argv[1:] not in (["take"], ["reconcile"], ["reconcile", "--repair"]):
+        sys.exit("usage: python snapshots.py take | reconcile [--repair]")
+    import database, migrations
+    migrations.upgrade(database.engine)
+    db = database.SessionLocal()
+    try:
+        if sys.argv[1] == "take":
+            count = take(db)
+            db.commit()
+            print(f"Snapshot taken for {count} products")
+        else:
+            report = reconcile(db, repair="--repair" in sys.argv)
+            for m in report["mismatches"]:
+                print(f"product {m['product_id']}: quantity {m['quantity']}, ledger says {m['expected_quantity']}"
+                      + (" (repaired)" if m["repaired"] else ""))
+            print(f"{report['products_checked']} products checked, {report['transactions_scanned']} transactions scanned, "
+                  f"{len(report['mismatches'])} mismatches, {report['repaired']} repaired in {report['seconds']} s")
+    finally:
+        db.close()
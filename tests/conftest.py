@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+import pytest
+from fastapi.testclient import TestClient
+
+# The app modules live at the repository root and read their settings at
+# import time, so point them at a scratch database before any is imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["INVENTORY_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/inventory.db"
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    # One portal (event loop) for every request, as the async engine's connections require
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture
+def vendor(client):
+    return client.post("/vendors/", json={"name": "Test vendor", "contact_email": "vendor@example.com", "phone": "0"}).json()
@@ -0,0 +1,44 @@
+"""
+A write still in flight while a delta backup runs is carried by the next
+delta, however long it ran.
+"""
+import json
+from sqlalchemy import text
+import database
+
+def backup(client, **params):
+    response = client.get("/system/backup", params=params)
+    assert response.status_code == 200
+    return json.loads(response.content)
+
+def test_delta_after_watermark_includes_write_in_flight_during_export(client, vendor):
+    product = client.post("/products/", json={"name": "Synced", "price": 1.0, "quantity": 1, "vendor_id": vendor["id"]}).json()
+    watermark = backup(client)["watermark"]
+
+    db = database.SessionLocal()
+    try:
+        # Holds the write lock, uncommitted, across the export below
+        db.execute(text("UPDATE products SET price = 9.5 WHERE id = :id"), {"id": product["id"]})
+        during = backup(client, since=watermark)
+        assert product["id"] not in [p["id"] for p in during["products"]]
+        db.commit()
+    finally:
+        db.close()
+
+    after = backup(client, since=during["watermark"])
+    assert [p["price"] for p in after["products"] if p["id"] == product["id"]] == [9.5]
+    assert "change_seq" not in after["products"][0]
+
+def test_delta_carries_only_later_changes_and_tombstones(client, vendor):
+    keep = client.post("/products/", json={"name": "Keep", "price": 1.0, "quantity": 1, "vendor_id": vendor["id"]}).json()
+    gone = client.post("/products/", json={"name": "Gone", "price": 1.0, "quantity": 1, "vendor_id": vendor["id"]}).json()
+    watermark = backup(client)["watermark"]
+
+    client.post("/transactions/", json={"product_id": keep["id"], "vendor_id": vendor["id"], "quantity": 2})
+    client.delete(f"/products/{gone['id']}")
+
+    delta = backup(client, since=watermark)
+    assert delta["since"] == watermark and delta["watermark"] > watermark
+    assert [p["id"] for p in delta["products"]] == [keep["id"]]
+    assert [t["product_id"] for t in delta["transactions"]] == [keep["id"]]
+    assert [(t["table_name"], t["row_id"]) for t in delta["tombstones"]] == [("products", gone["id"])]
@@ -0,0 +1,26 @@
+"""
+A row repeating a key from an earlier chunk of the same file is a
+duplicate, not an update.
+"""
+
+def import_csv(client, path, csv, **params):
+    response = client.post(path, params=params, files={"file": ("import.csv", csv)})
+    assert response.status_code == 200
+    body = response.json()
+    return {k: body[k] for k in ("inserted", "updated", "duplicates")}
+
+def test_products_duplicate_across_chunks(client, vendor):
+    csv = "name,price\nChunked,1\nOther,1\nChunked,2\n"
+    report = import_csv(client, "/products/import", csv, vendor_id=vendor["id"], chunk_size=2)
+    assert report == {"inserted": 2, "updated": 0, "duplicates": 1}
+    products = client.get("/products/").json()
+    assert [p["price"] for p in products if p["name"] == "Chunked"] == [2.0]
+
+    # Imported again, both products exist and count as updates once
+    report = import_csv(client, "/products/import", csv, vendor_id=vendor["id"], chunk_size=2)
+    assert report == {"inserted": 0, "updated": 2, "duplicates": 1}
+
+def test_vendors_duplicate_across_chunks(client):
+    csv = "name,contact_email,phone\nChunky,a@example.com,1\nLumpy,a@example.com,1\nChunky,b@example.com,2\n"
+    report = import_csv(client, "/vendors/import", csv, chunk_size=2)
+    assert report == {"inserted": 2, "updated": 0, "duplicates": 1}
@@ -0,0 +1,63 @@
+"""
+A group that mixes refused and accepted posts commits, and announces,
+only the accepted ones.
+"""
+import asyncio
+import threading
+import time
+import database, events, groupcommit, models
+
+POSTS = 4
+
+def test_group_commits_only_accepted_items(client, vendor, monkeypatch):
+    monkeypatch.setattr(groupcommit, "GROUP_COMMIT_ENABLED", True)
+    product = client.post("/products/", json={"name": "Grouped", "price": 1.0, "quantity": 2, "vendor_id": vendor["id"]}).json()
+    loop = asyncio.new_event_loop()
+    sub = events.Subscriber(loop, product_ids=[product["id"]])
+    events.broker.subscribe(sub)
+    # The quantity another connection sees when each quantity_changed is
+    # published: the group's result, or the old 2 if published before its commit
+    seen = []
+    publish = events.broker.publish
+    def checked_publish(items):
+        items = list(items)
+        with database.SessionLocal() as db:
+            for type, data in items:
+                if type == "quantity_changed" and data["product_id"] == product["id"]:
+                    seen.append(db.get(models.Product, product["id"]).quantity)
+        publish(items)
+    monkeypatch.setattr(events.broker, "publish", checked_publish)
+    try:
+        # Hold the writer so every post below lands in the same group
+        gate = threading.Event()
+        blocker = groupcommit.submit(lambda db: gate.wait(10))
+        statuses = []
+        def post():
+            response = client.post("/transactions/", json={
+                "product_id": product["id"], "vendor_id": vendor["id"], "quantity": -1,
+            })
+            statuses.append(response.status_code)
+        threads = [threading.Thread(target=post) for _ in range(POSTS)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 10
+        while groupcommit._queue.qsize() < POSTS and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gate.set()
+        blocker.result()
+        for thread in threads:
+            thread.join()
+
+        # Stock for two of the four; the other two are refused inside the group
+        assert sorted(statuses) == [200, 200, 409, 409]
+        assert client.get(f"/products/{product['id']}").json()["quantity"] == 0
+        history = client.get(f"/products/{product['id']}/transactions").json()
+        assert [t["quantity"] for t in history] == [-1, -1]
+
+        frames = b"".join(loop.run_until_complete(sub.next_frames(1)))
+        assert frames.count(b"event: transaction_created") == 2
+        assert frames.count(b"event: quantity_changed") == 2
+        assert seen == [0, 0]
+    finally:
+        events.broker.unsubscribe(sub)
+        loop.close()
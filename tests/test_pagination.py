@@ -0,0 +1,28 @@
+"""
+Every cursor-paged list follows X-Next-Cursor to the next page and
+answers a malformed cursor with 400.
+"""
+import pytest
+
+PATHS = ["/vendors/", "/products/", "/transactions/", "/async/vendors/", "/async/products/", "/async/transactions/"]
+
+@pytest.mark.parametrize("path", PATHS)
+def test_cursor_pages_through_list(client, vendor, path):
+    for _ in range(3):
+        product = client.post("/products/", json={"name": "Paged", "price": 1.0, "quantity": 5, "vendor_id": vendor["id"]}).json()
+        client.post("/transactions/", json={"product_id": product["id"], "vendor_id": vendor["id"], "quantity": 1})
+    everything = [row["id"] for row in client.get(path, params={"limit": 1000}).json()]
+    seen, cursor = [], None
+    while True:
+        response = client.get(path, params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        seen += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == everything
+
+@pytest.mark.parametrize("path", PATHS)
+def test_malformed_cursor_is_400(client, path):
+    response = client.get(path, params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
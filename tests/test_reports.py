@@ -0,0 +1,17 @@
+"""
+The low-stock list and the dashboard count agree, including after a
+vendor is deleted.
+"""
+
+def test_low_stock_skips_products_of_deleted_vendors(client, vendor):
+    gone = client.post("/vendors/", json={"name": "Gone", "contact_email": "gone@example.com", "phone": "0"}).json()
+    for owner in (vendor, gone):
+        client.post("/products/", json={"name": "Low", "price": 1.0, "quantity": 0, "vendor_id": owner["id"]})
+    assert client.delete(f"/vendors/{gone['id']}").status_code == 200
+
+    for params in ({}, {"threshold": 5}):
+        response = client.get("/reports/low-stock", params={**params, "limit": 1000})
+        assert response.status_code == 200
+        assert all(p["vendor_id"] is not None for p in response.json())
+        summary = client.get("/reports/summary", params=params).json()
+        assert summary["low_stock_count"] == len(response.json())
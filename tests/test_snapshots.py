@@ -0,0 +1,21 @@
+"""
+Reconciliation must not mistake a product for a deleted one whose id it
+reuses.
+"""
+import pytest
+
+@pytest.mark.parametrize("prefix", ["", "/async"])
+def test_reused_product_id_gets_its_own_snapshot(client, vendor, prefix):
+    old = client.post("/products/", json={"name": "Old", "price": 1.0, "quantity": 3, "vendor_id": vendor["id"]}).json()
+    assert client.delete(f"{prefix}/products/{old['id']}").status_code == 200
+
+    csv = f"name,price,quantity,vendor_id\nNew{prefix},1.0,40,{vendor['id']}\n"
+    report = client.post("/products/import", files={"file": ("products.csv", csv)}).json()
+    assert report["inserted"] == 1
+    new = client.get(f"/products/{old['id']}").json()
+    # SQLite hands the freed id to the next product
+    assert new["name"] == f"New{prefix}"
+
+    result = client.post("/system/reconcile").json()
+    assert [m for m in result["mismatches"] if m["product_id"] == new["id"]] == []
+    assert client.get(f"/products/{new['id']}").json()["quantity"] == 40
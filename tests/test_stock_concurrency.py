@@ -0,0 +1,54 @@
+"""
+Parallel transactions against one product must neither lose an update
+nor take the quantity below zero.
+"""
+import random
+import threading
+import pytest
+
+THREADS = 8
+POSTS_PER_THREAD = 25
+START_QUANTITY = 5
+
+@pytest.fixture
+def product(client, vendor):
+    return client.post("/products/", json={
+        "name": "Contended", "price": 2.0, "quantity": START_QUANTITY, "vendor_id": vendor["id"],
+    }).json()
+
+@pytest.mark.parametrize("path", ["/transactions/", "/async/transactions/"])
+def test_parallel_transactions_keep_exact_quantity(client, product, path):
+    results = []
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def post(seed):
+        rng = random.Random(seed)
+        # Mostly decreases, so the stock runs out and some are rejected
+        deltas = [1 if rng.random() < 0.3 else -1 for _ in range(POSTS_PER_THREAD)]
+        start.wait()
+        for delta in deltas:
+            response = client.post(path, json={
+                "product_id": product["id"], "vendor_id": product["vendor_id"], "quantity": delta,
+            })
+            with lock:
+                results.append((delta, response.status_code))
+
+    threads = [threading.Thread(target=post, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == THREADS * POSTS_PER_THREAD
+    accepted = [delta for delta, status in results if status == 200]
+    rejected = [(delta, status) for delta, status in results if status != 200]
+    assert rejected, "the stock never ran out; the test did not exercise the check"
+    assert all(delta < 0 and status == 409 for delta, status in rejected)
+
+    final = client.get(f"/products/{product['id']}").json()["quantity"]
+    assert final == START_QUANTITY + sum(accepted)
+    assert final >= 0
+
+    history = client.get(f"/products/{product['id']}/transactions", params={"limit": 1000}).json()
+    assert sorted(t["quantity"] for t in history) == sorted(accepted)